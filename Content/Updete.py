@@ -1,16 +1,12 @@
-import cv2
-import pytesseract
-import pandas as pd
-import re
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-from PIL import Image, ImageTk
-import numpy as np
 import os
+from bisect import bisect
 from datetime import datetime
 
-# Set Tesseract path (update this for your system)
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+from background_processing import FormBatchRunner, create_executor, start_warm_up
+
+# The tesseract executable is set with TESSERACT_CMD; see ocr_engine.configure_tesseract_cmd
 
 class InsuranceClaimProcessor:
     def __init__(self, root):
@@ -21,13 +17,23 @@ class InsuranceClaimProcessor:
         
         # Initialize variables
         self.forms = []
+        # Claims in claim ID order, with their IDs alongside so a late result finds its place
         self.records = []
+        self.record_ids = []
+        # (-ClaimAmount, ClaimID) of each row of the priority ranking, highest priority first
+        self.priority_keys = []
         self.claim_id_counter = 101
         self.current_image_index = -1
         self.current_image = None
+        self.executor = None
+        self.runner = None
         
         # Create GUI
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # cv2, PIL, pandas and the OCR engine are imported where first used; load them once the window is up
+        self.root.after_idle(start_warm_up)
         
     def create_widgets(self):
         # Main frame
@@ -55,6 +61,14 @@ class InsuranceClaimProcessor:
         ttk.Button(main_frame, text="Export Results", command=self.export_results).grid(row=2, column=1, pady=10, sticky=tk.W)
         ttk.Button(main_frame, text="Clear All", command=self.clear_all).grid(row=2, column=2, pady=10, sticky=tk.W)
         
+        # Background processing controls
+        control_frame = ttk.Frame(main_frame)
+        control_frame.grid(row=2, column=3, pady=10, sticky=tk.W)
+        self.pause_button = ttk.Button(control_frame, text="Pause", command=self.toggle_pause, state=tk.DISABLED)
+        self.pause_button.grid(row=0, column=0, padx=(0, 5))
+        self.cancel_button = ttk.Button(control_frame, text="Cancel", command=self.cancel_processing, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1)
+        
         # Image preview
         ttk.Label(main_frame, text="Form Preview:", font=("Arial", 10, "bold")).grid(row=3, column=0, sticky=tk.W, pady=(20, 5))
         self.image_label = ttk.Label(main_frame, text="No image selected", background="white", anchor="center")
@@ -154,18 +168,20 @@ class InsuranceClaimProcessor:
         if not self.forms or self.current_image_index < 0:
             return
             
-        image_path = self.forms[self.current_image_index]
-        self.current_image = cv2.imread(image_path)
+        from PIL import ImageTk
+        from thumbnail_cache import load_thumbnail
         
-        # Resize image for display
-        display_image = self.resize_image(self.current_image, 300, 400)
-        
-        # Convert to PIL format and then to ImageTk format
-        display_image = cv2.cvtColor(display_image, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(display_image)
-        tk_image = ImageTk.PhotoImage(pil_image)
+        # Decoded at reduced resolution for display; OCR reads the file itself
+        image_path = self.forms[self.current_image_index]
+        self.current_image = load_thumbnail(image_path, 300, 400)
+        if self.current_image is None:
+            self.image_label.configure(image="", text="Could not load image")
+            self.image_label.image = None
+            self.status_var.set(f"Image {self.current_image_index + 1} of {len(self.forms)} could not be read")
+            return
         
         # Update image label
+        tk_image = ImageTk.PhotoImage(self.current_image)
         self.image_label.configure(image=tk_image, text="")
         self.image_label.image = tk_image
         
@@ -175,29 +191,14 @@ class InsuranceClaimProcessor:
         # Extract and show text
         self.extract_text()
         
-    def resize_image(self, image, max_width, max_height):
-        height, width = image.shape[:2]
-        
-        if width > max_width or height > max_height:
-            # Calculate scaling factor
-            scale = min(max_width/width, max_height/height)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            
-            # Resize the image
-            return cv2.resize(image, (new_width, new_height))
-        return image
-        
     def extract_text(self):
         if self.current_image is None:
             return
             
-        # Preprocess image for better OCR
-        gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-        thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        from claim_processing import ocr_file
         
-        # Extract text using Tesseract
-        text = pytesseract.image_to_string(thresh)
+        # Preprocess and OCR the file as batch processing does, reusing cached text
+        text = ocr_file(self.forms[self.current_image_index]) or ""
         
         # Display extracted text
         self.text_area.delete(1.0, tk.END)
@@ -211,174 +212,165 @@ class InsuranceClaimProcessor:
         for item in self.validation_tree.get_children():
             self.validation_tree.delete(item)
             
-        claim = {"ClaimID": self.claim_id_counter, "Name": None, "ClaimType": None,
-                 "ClaimAmount": None, "validation_status": None, "validation_reasons": ""}
+        from claim_processing import process_text
+        claim = process_text(text, self.claim_id_counter)
         
-        # Extract name
-        name_match = re.search(r"Name of Insured\s*[:]?\s*([A-Za-z ]+)", text, re.IGNORECASE)
-        if name_match:
-            claim["Name"] = name_match.group(1).strip()
+        if claim["Name"]:
             self.validation_tree.insert("", "end", values=("Name", "✓ Found", claim["Name"]))
         else:
             self.validation_tree.insert("", "end", values=("Name", "✗ Missing", "Not found"))
-        
-        # Extract claim type
-        claim_type = None
-        if re.search(r"Health", text, re.IGNORECASE):
-            claim_type = "Health"
-        elif re.search(r"Auto", text, re.IGNORECASE):
-            claim_type = "Auto"
-        elif re.search(r"Life", text, re.IGNORECASE):
-            claim_type = "Life"
             
-        if claim_type:
-            claim["ClaimType"] = claim_type
-            self.validation_tree.insert("", "end", values=("Claim Type", "✓ Found", claim_type))
+        if claim["ClaimType"]:
+            self.validation_tree.insert("", "end", values=("Claim Type", "✓ Found", claim["ClaimType"]))
         else:
             self.validation_tree.insert("", "end", values=("Claim Type", "✗ Missing", "Not found"))
-        
-        # Extract claim amount
-        amount_match = re.search(r"Claim Amount\s*[:]?\s*[\$]?\s*(\d+[.,]?\d*)", text, re.IGNORECASE)
-        if amount_match:
-            amount_str = amount_match.group(1).replace(',', '').replace('.', '')
-            claim["ClaimAmount"] = int(amount_str)
+            
+        if claim["ClaimAmount"] is not None:
             self.validation_tree.insert("", "end", values=("Claim Amount", "✓ Found", f"${claim['ClaimAmount']}"))
         else:
-            # Fallback: look for any dollar amount in the text
-            fallback_match = re.search(r"\$?\s*(\d+[.,]?\d*)", text)
-            if fallback_match:
-                amount_str = fallback_match.group(1).replace(',', '').replace('.', '')
-                claim["ClaimAmount"] = int(amount_str)
-                self.validation_tree.insert("", "end", values=("Claim Amount", "✓ Found", f"${claim['ClaimAmount']}"))
-            else:
-                self.validation_tree.insert("", "end", values=("Claim Amount", "✗ Missing", "Not found"))
-        
-        # Validate the claim
-        reasons = []
-        if not claim["Name"]:
-            reasons.append("Missing Name")
-        if claim["ClaimAmount"] is None or claim["ClaimAmount"] <= 0:
-            reasons.append("Invalid ClaimAmount")
-        if not claim["ClaimType"]:
-            reasons.append("Invalid ClaimType")
-
-        if reasons:
-            claim["validation_status"] = "Invalid"
-            claim["validation_reasons"] = ", ".join(reasons)
-            self.validation_tree.insert("", "end", values=("Overall", "✗ Invalid", ", ".join(reasons)))
+            self.validation_tree.insert("", "end", values=("Claim Amount", "✗ Missing", "Not found"))
+        
+        if claim["validation_status"] == "Invalid":
+            self.validation_tree.insert("", "end", values=("Overall", "✗ Invalid", claim["validation_reasons"]))
         else:
-            claim["validation_status"] = "Valid"
             self.validation_tree.insert("", "end", values=("Overall", "✓ Valid", "All fields OK"))
         
-        # Store the claim for later processing
-        self.records.append(claim)
-        
     def process_forms(self):
         if not self.forms:
             messagebox.showwarning("Warning", "Please upload form images first.")
             return
             
-        self.records = []
+        if self.runner is not None:
+            messagebox.showwarning("Warning", "Forms are already being processed.")
+            return
+            
+        self.clear_results()
         self.claim_id_counter = 101
         
-        # Process all forms
-        for i, form in enumerate(self.forms):
-            self.status_var.set(f"Processing form {i+1} of {len(self.forms)}")
-            self.root.update()
-            
-            img = cv2.imread(form)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-            
-            text = pytesseract.image_to_string(thresh)
+        # Process all forms on the worker pool; results are collected by poll_processing()
+        if self.executor is None:
+            self.executor = create_executor()
+        self.runner = FormBatchRunner(self.executor, self.forms, self.claim_id_counter)
+        self.runner.pump()
+        
+        self.pause_button.configure(text="Pause", state=tk.NORMAL)
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.status_var.set(f"Processing {len(self.forms)} form(s)")
+        self.root.after(50, self.poll_processing)
+        
+    def poll_processing(self):
+        runner = self.runner
+        if runner is None:
+            return
             
-            claim = {"ClaimID": self.claim_id_counter, "Name": None, "ClaimType": None,
-                     "ClaimAmount": None, "validation_status": None, "validation_reasons": ""}
-
-            # Extract name
-            match = re.search(r"Name of Insured\s*[:]?\s*([A-Za-z ]+)", text, re.IGNORECASE)
-            if match:
-                claim["Name"] = match.group(1).strip()
-
-            # Extract claim type
-            if re.search(r"Health", text, re.IGNORECASE):
-                claim["ClaimType"] = "Health"
-            elif re.search(r"Auto", text, re.IGNORECASE):
-                claim["ClaimType"] = "Auto"
-            elif re.search(r"Life", text, re.IGNORECASE):
-                claim["ClaimType"] = "Life"
-
-            # Extract claim amount
-            amount_match = re.search(r"Claim Amount\s*[:]?\s*[\$]?\s*(\d+[.,]?\d*)", text, re.IGNORECASE)
-            if amount_match:
-                amount_str = amount_match.group(1).replace(',', '').replace('.', '')
-                claim["ClaimAmount"] = int(amount_str)
-            else:
-                # Fallback: look for any dollar amount in the text
-                fallback_match = re.search(r"\$?\s*(\d+[.,]?\d*)", text)
-                if fallback_match:
-                    amount_str = fallback_match.group(1).replace(',', '').replace('.', '')
-                    claim["ClaimAmount"] = int(amount_str)
-
-            # Validate the claim
-            reasons = []
-            if not claim["Name"]:
-                reasons.append("Missing Name")
-            if claim["ClaimAmount"] is None or claim["ClaimAmount"] <= 0:
-                reasons.append("Invalid ClaimAmount")
-            if not claim["ClaimType"]:
-                reasons.append("Invalid ClaimType")
-
-            if reasons:
+        received = 0
+        for form, claim_id, result, error in runner.drain():
+            if error is not None:
+                from claim_processing import new_claim
+                claim = new_claim(claim_id)
                 claim["validation_status"] = "Invalid"
-                claim["validation_reasons"] = ", ".join(reasons)
+                claim["validation_reasons"] = f"Processing Error: {error}"
             else:
-                claim["validation_status"] = "Valid"
-
-            self.records.append(claim)
-            self.claim_id_counter += 1
+                claim = result[0]
+            self.add_record(claim)
+            received += 1
+            
+        # Keep the pool topped up with the next forms
+        runner.pump()
+        
+        if runner.finished:
+            self.runner = None
+            self.claim_id_counter = 101 + runner.total
+            self.pause_button.configure(text="Pause", state=tk.DISABLED)
+            self.cancel_button.configure(state=tk.DISABLED)
+            if runner.cancelled:
+                self.status_var.set(f"Cancelled after {runner.completed} of {runner.total} form(s)")
+            else:
+                self.status_var.set(f"Processed {runner.total} form(s)")
+            return
+            
+        if runner.paused:
+            self.status_var.set(f"Paused after {runner.completed} of {runner.total} form(s)")
+        elif runner.cancelled:
+            self.status_var.set(f"Cancelling... waiting for {len(runner.in_flight)} form(s) in progress")
+        else:
+            self.status_var.set(f"Processing form {runner.completed + 1} of {runner.total}")
+        self.root.after(50, self.poll_processing)
         
-        # Display results
-        self.display_results()
-        self.status_var.set(f"Processed {len(self.forms)} form(s)")
+    def toggle_pause(self):
+        if self.runner is None:
+            return
+        if self.runner.paused:
+            self.runner.resume()
+            self.pause_button.configure(text="Pause")
+        else:
+            self.runner.pause()
+            self.pause_button.configure(text="Resume")
+            
+    def cancel_processing(self):
+        if self.runner is None:
+            return
+        self.runner.cancel()
+        self.pause_button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.DISABLED)
+        
+    def on_close(self):
+        if self.runner is not None:
+            self.runner.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+        
+    def add_record(self, claim):
+        # Claims finish in any order; each goes in at its claim ID's place, so the results
+        # and exports come out the same in every run, and only its own rows are drawn
+        position = bisect(self.record_ids, claim["ClaimID"])
+        self.record_ids.insert(position, claim["ClaimID"])
+        self.records.insert(position, claim)
+        self.validation_results_tree.insert("", position, values=(
+            claim["ClaimID"],
+            claim["Name"] or "N/A",
+            claim["ClaimType"] or "N/A",
+            f"${claim['ClaimAmount']}" if claim["ClaimAmount"] else "N/A",
+            claim["validation_status"],
+            claim["validation_reasons"]
+        ))
+        
+        if claim["validation_status"] != "Valid":
+            return
+        # Highest amount first, ties by claim ID
+        key = (-claim["ClaimAmount"], claim["ClaimID"])
+        position = bisect(self.priority_keys, key)
+        self.priority_keys.insert(position, key)
+        self.priority_tree.insert("", position, values=(
+            position + 1,
+            claim["ClaimID"],
+            claim["Name"],
+            claim["ClaimType"],
+            f"${claim['ClaimAmount']}"
+        ))
+        # Rows ranked below it move down one place
+        for rank, item in enumerate(self.priority_tree.get_children()[position + 1:], position + 2):
+            self.priority_tree.set(item, "Priority", rank)
+        
+    def clear_results(self):
+        self.records = []
+        self.record_ids = []
+        self.priority_keys = []
         
-    def display_results(self):
-        # Clear previous results
         for item in self.validation_results_tree.get_children():
             self.validation_results_tree.delete(item)
             
         for item in self.priority_tree.get_children():
             self.priority_tree.delete(item)
         
-        # Display validation results
-        for record in self.records:
-            self.validation_results_tree.insert("", "end", values=(
-                record["ClaimID"],
-                record["Name"] or "N/A",
-                record["ClaimType"] or "N/A",
-                f"${record['ClaimAmount']}" if record["ClaimAmount"] else "N/A",
-                record["validation_status"],
-                record["validation_reasons"]
-            ))
-        
-        # Display priority ranking
-        valid_claims = [claim for claim in self.records if claim["validation_status"] == "Valid"]
-        valid_claims.sort(key=lambda x: x["ClaimAmount"], reverse=True)
-        
-        for i, claim in enumerate(valid_claims):
-            self.priority_tree.insert("", "end", values=(
-                i+1,
-                claim["ClaimID"],
-                claim["Name"],
-                claim["ClaimType"],
-                f"${claim['ClaimAmount']}"
-            ))
-        
     def export_results(self):
         if not self.records:
             messagebox.showwarning("Warning", "No data to export. Please process forms first.")
             return
             
+        import pandas as pd
+        
         # Create DataFrames
         df = pd.DataFrame(self.records)
         valid_claims = df[df["validation_status"] == "Valid"].copy()
@@ -403,25 +395,25 @@ class InsuranceClaimProcessor:
             messagebox.showinfo("Success", f"Results exported successfully to {file_path}")
         
     def clear_all(self):
+        if self.runner is not None:
+            self.cancel_processing()
+            self.runner = None
+            self.pause_button.configure(text="Pause")
+            
         self.forms = []
-        self.records = []
+        self.clear_results()
         self.claim_id_counter = 101
         self.current_image_index = -1
         self.current_image = None
         
         # Clear UI elements
         self.image_label.configure(image="", text="No image selected")
+        self.image_label.image = None
         self.text_area.delete(1.0, tk.END)
         
         for item in self.validation_tree.get_children():
             self.validation_tree.delete(item)
             
-        for item in self.validation_results_tree.get_children():
-            self.validation_results_tree.delete(item)
-            
-        for item in self.priority_tree.get_children():
-            self.priority_tree.delete(item)
-            
         self.status_var.set("Ready to process forms")
         
     def next_image(self):
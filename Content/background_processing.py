@@ -0,0 +1,122 @@
+import importlib
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# cv2, numpy, pandas, PIL, pyarrow and the OCR engine take seconds to import on a cold
+# start, so the GUIs import them where they are first used and open without them.
+# start_warm_up() then loads them on a background thread; CLAIMS_WARM_UP=0 skips that.
+# tesserocr isn't in the list because it can only be imported on the main thread (it
+# installs signal handlers), so ocr_engine and claim_processing are left to first use,
+# which then takes a few tens of milliseconds.
+WARM_UP_MODULES = ("numpy", "cv2", "pandas", "pyarrow", "PIL.ImageTk", "pytesseract", "image_preprocessing",
+                   "form_templates", "result_sinks")
+
+
+class FormBatchRunner:
+    """Feeds forms to a worker pool and hands finished claims back to the Tk mainloop.
+
+    Only a bounded number of forms is submitted at a time, so pausing or
+    cancelling takes effect after the forms already in flight. All methods
+    except the done-callback are meant to be called from the GUI thread,
+    which polls drain() with root.after().
+    """
+
+    def __init__(self, executor, forms, first_claim_id=101, max_in_flight=None, worker=None, claim_ids=None):
+        # claim_ids, if given, holds each form's claim ID instead of numbering from first_claim_id
+        if claim_ids is None:
+            claim_ids = range(first_claim_id, first_claim_id + len(forms))
+        if worker is None:
+            from claim_processing import process_form as worker
+        self.executor = executor
+        self.worker = worker
+        self.total = len(forms)
+        self.pending = deque(zip(forms, claim_ids))
+        self.in_flight = {}
+        self.results = queue.Queue()
+        self.max_in_flight = max_in_flight or 2 * (getattr(executor, "_max_workers", None) or os.cpu_count() or 1)
+        self.paused = False
+        self.cancelled = False
+        self.completed = 0
+
+    def pump(self):
+        while not self.paused and not self.cancelled and self.pending and len(self.in_flight) < self.max_in_flight:
+            form, claim_id = self.pending.popleft()
+            future = self.executor.submit(self.worker, form, claim_id)
+            self.in_flight[future] = (form, claim_id)
+            # Runs on an executor thread; the queue is the only state it touches
+            future.add_done_callback(self.results.put)
+
+    def add(self, forms, claim_ids):
+        # More forms for a runner that keeps going, such as one fed by a watched folder
+        self.pending.extend(zip(forms, claim_ids))
+        self.total += len(forms)
+        self.pump()
+
+    def drain(self, timeout=None):
+        # With a timeout, waits up to that long for the first finished form
+        block = timeout is not None
+        while True:
+            try:
+                future = self.results.get(block, timeout)
+            except queue.Empty:
+                return
+            block = False
+            form, claim_id = self.in_flight.pop(future)
+            if future.cancelled():
+                continue
+            self.completed += 1
+            error = future.exception()
+            yield form, claim_id, None if error else future.result(), error
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        self.pump()
+
+    def cancel(self):
+        self.cancelled = True
+        self.pending.clear()
+        for future in list(self.in_flight):
+            future.cancel()
+
+    @property
+    def finished(self):
+        return not self.in_flight and (self.cancelled or not self.pending)
+
+
+def create_executor(workers=None):
+    # claim_processing brings in cv2 and the OCR engine, so the GUIs import it (via this
+    # module) only once there is work for the pool. Workers are forked from this process,
+    # so wait for any warm-up imports to finish rather than fork mid-import.
+    if _warm_up_thread is not None:
+        _warm_up_thread.join()
+    from claim_processing import init_worker
+
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+
+
+def warm_up_imports(modules=WARM_UP_MODULES):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            # Missing or broken modules are reported where they are actually needed
+            pass
+
+
+_warm_up_thread = None
+
+
+def start_warm_up(modules=WARM_UP_MODULES):
+    # Returns the loading thread, or None when disabled
+    global _warm_up_thread
+    if os.environ.get("CLAIMS_WARM_UP", "1") == "0":
+        return None
+    _warm_up_thread = threading.Thread(target=warm_up_imports, args=(modules,), daemon=True)
+    _warm_up_thread.start()
+    return _warm_up_thread
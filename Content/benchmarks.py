@@ -0,0 +1,901 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+BENCHMARKS = {}
+# Largest size each benchmark runs at; the suite default goes up to 100k claims,
+# which would take hours for benchmarks that decode or OCR real images
+MAX_SIZES = {}
+
+DEFAULT_SIZES = [10, 1000, 100000]
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_thresholds.json")
+DEFAULT_TOLERANCE = 0.25
+# Result fields compared against thresholds and baselines; lower is better for all of them
+METRICS = ("us_per_item", "bytes_per_item", "peak_bytes")
+
+
+def benchmark(name, max_size=None):
+    def register(func):
+        BENCHMARKS[name] = func
+        MAX_SIZES[name] = max_size
+        return func
+    return register
+
+
+def synthetic_claims(n, first_claim_id=101, seed=0):
+    rng = random.Random(seed)
+    names = ["John Doe", "Mary Smith", "Jane Roe", "Alex Brown", "Sam Green"]
+    claim_types = ["Health", "Auto", "Life"]
+    claims = []
+    for i in range(n):
+        valid = rng.random() < 0.8
+        claims.append({
+            "ClaimID": first_claim_id + i,
+            "Name": rng.choice(names) if valid else None,
+            "ClaimType": rng.choice(claim_types),
+            "ClaimAmount": rng.randint(1, 100000),
+            "validation_status": "Valid" if valid else "Invalid",
+            "validation_reasons": "" if valid else "Missing Name",
+        })
+    return claims
+
+
+def synthetic_ocr_texts(n, noise_lines=40, seed=0):
+    # OCR-like pages: form labels and values surrounded by lines of noise
+    rng = random.Random(seed)
+    words = ["Policy", "Number", "Date", "of", "Birth", "Patient", "Relationship", "SELF", "SPOUSE",
+             "OTHER", "Signature", "Illness", "Injury", "employment", "accident", "checkup", "|", "—"]
+    texts = []
+    for i in range(n):
+        lines = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 10))) for _ in range(noise_lines)]
+        lines.insert(rng.randrange(len(lines)), f"Name of Insured\n{rng.choice(['John Doe', 'Mary Smith'])}")
+        lines.insert(rng.randrange(len(lines)), f"Claim Amount ${rng.randint(1, 99999)}")
+        lines.insert(rng.randrange(len(lines)), rng.choice(["HEALTH INSURANCE CLAIM FORM", "AUTO CLAIM", "LIFE POLICY"]))
+        texts.append("\n".join(lines))
+    return texts
+
+
+def synthetic_claim_table(n, seed=0):
+    # Tabular claims shaped like enhanced_health_insurance_claims.csv, with a few percent of bad values
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2022-01-01", "2024-12-31").strftime("%Y-%m-%d").to_numpy()
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    procedure_codes = np.char.add(np.char.add(rng.choice(letters, 5000), rng.choice(letters, 5000)),
+                                  np.char.zfill(rng.integers(0, 1000, 5000).astype(str), 3)).astype(object)
+    df = pd.DataFrame({
+        "ClaimID": np.arange(n),
+        "PatientID": rng.integers(0, max(1, n // 3), n).astype(str).astype(object),
+        "ProviderID": rng.integers(0, 2000, n).astype(str).astype(object),
+        "ClaimAmount": rng.uniform(100, 10000, n).round(2),
+        "ClaimDate": rng.choice(dates, n),
+        "ProcedureCode": rng.choice(procedure_codes, n),
+        "PatientAge": rng.integers(0, 90, n),
+        "PatientGender": rng.choice(np.array(["M", "F"], dtype=object), n),
+        "ProviderSpecialty": rng.choice(np.array(["Cardiology", "Neurology", "Orthopedics", "General Practice",
+                                                  "Pediatrics"], dtype=object), n),
+        "ClaimType": rng.choice(np.array(["Emergency", "Inpatient", "Outpatient", "Routine"], dtype=object), n),
+    })
+    bad = rng.random(n) < 0.02
+    df.loc[bad, "ClaimAmount"] = -1.0
+    df.loc[rng.random(n) < 0.01, "ClaimType"] = "Unknown"
+    return df
+
+
+def write_synthetic_claim_csv(path, n, chunksize=500000):
+    # Written in chunks so multi-GB files can be generated without holding them in memory
+    for start in range(0, n, chunksize):
+        df = synthetic_claim_table(min(chunksize, n - start), seed=start)
+        df["ClaimID"] += start
+        df.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+def report(name, n, seconds, unit="item"):
+    per_item = seconds / n * 1e6 if n else 0.0
+    print(f"{name:<28} n={n:<8} total={seconds:8.3f}s  {per_item:10.1f} us/{unit}")
+    return {"benchmark": name, "n": n, "seconds": seconds, "us_per_item": per_item}
+
+
+@benchmark("results_display", max_size=10000)
+def bench_results_display(sizes):
+    # Streams claims into the GUI one form at a time, flushing after each like the
+    # mainloop would; per-form cost should stay flat as the number of rows grows
+    import tkinter as tk
+    from insurance_validation_and_ranking import InsuranceClaimProcessor
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"results_display skipped: {e}")
+        return []
+    root.withdraw()
+
+    results = []
+    try:
+        for n in sizes:
+            app = InsuranceClaimProcessor(root)
+            claims = synthetic_claims(n)
+            window = max(1, n // 10)
+            start = time.perf_counter()
+            last_window = start
+            for i, claim in enumerate(claims, 1):
+                app.add_record(claim)
+                app.flush_results_display()
+                if i == n - window:
+                    last_window = time.perf_counter()
+            end = time.perf_counter()
+            results.append(report("results_display", n, end - start, "form"))
+            results.append(report("results_display_last_10pct", window, end - last_window, "form"))
+            for child in root.winfo_children():
+                child.destroy()
+    finally:
+        root.destroy()
+    return results
+
+
+@benchmark("startup")
+def bench_startup(sizes):
+    # Import time of each GUI module in a fresh interpreter, which the window can't appear
+    # before, and which heavy libraries the import pulled in; with a display, also the time
+    # until the main window has been drawn. The eager import of the heavy libraries is what
+    # the GUIs paid before they were loaded lazily. sizes are ignored: each figure is the
+    # mean of a few fresh processes.
+    import os
+    import subprocess
+
+    script = """
+import json, sys, time
+start = time.perf_counter()
+{imports}
+imported = time.perf_counter() - start
+heavy = [m for m in ("cv2", "numpy", "pandas", "PIL", "pyarrow", "pytesseract", "tesserocr") if m in sys.modules]
+window = None
+{window}
+print(json.dumps({{"import": imported, "window": window, "heavy": heavy}}))
+"""
+    window = """
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError:
+    root = None
+if root is not None:
+    {gui}.InsuranceClaimProcessor(root)
+    root.update()
+    window = time.perf_counter() - start
+    root.destroy()
+"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, CLAIMS_WARM_UP="0")
+    runs = 5
+    cases = [
+        ("startup_eager_imports", "import cv2, numpy, pandas, PIL.ImageTk", ""),
+        ("startup_import_gui", "import insurance_validation_and_ranking", "insurance_validation_and_ranking"),
+        ("startup_import_updete", "import Updete", "Updete"),
+    ]
+    results = []
+    for name, imports, gui in cases:
+        measured = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", script.format(imports=imports, window=window.format(gui=gui) if gui else "")], cwd=directory,
+                                    env=env, capture_output=True, text=True, check=True).stdout
+            measured.append(json.loads(output.splitlines()[-1]))
+        results.append(report(name, runs, sum(m["import"] for m in measured), "start"))
+        if gui:
+            print(f"{'':<28} heavy modules loaded: {', '.join(measured[-1]['heavy']) or 'none'}")
+            windows = [m["window"] for m in measured if m["window"] is not None]
+            if windows:
+                results.append(report(name.replace("import", "window"), len(windows), sum(windows), "start"))
+    return results
+
+
+@benchmark("ranking")
+def bench_ranking(sizes):
+    # Live ranking during streaming: one insert plus a top-10 query per valid claim
+    from priority_ranking import PriorityRanking
+
+    results = []
+    for n in sizes:
+        claims = [c for c in synthetic_claims(n) if c["validation_status"] == "Valid"]
+        ranking = PriorityRanking()
+        start = time.perf_counter()
+        for claim in claims:
+            ranking.add(claim)
+            ranking.top(10)
+        results.append(report("ranking_incremental", len(claims), time.perf_counter() - start, "claim"))
+
+        # The previous approach re-sorted every valid claim after each form, so
+        # cap it to keep large sizes from running for hours
+        if n <= 10000:
+            ranked = []
+            start = time.perf_counter()
+            for claim in claims:
+                ranked.append(claim)
+                ranked.sort(key=lambda x: x["ClaimAmount"], reverse=True)
+                ranked[:10]
+            results.append(report("ranking_full_resort", len(claims), time.perf_counter() - start, "claim"))
+    return results
+
+
+@benchmark("search")
+def bench_search(sizes):
+    # Keystroke-by-keystroke search latency against the index, with and without a status filter
+    from search_index import ClaimSearchIndex
+
+    results = []
+    for n in sizes:
+        index = ClaimSearchIndex()
+        start = time.perf_counter()
+        for record_id, record in enumerate(synthetic_claims(n)):
+            index.add(record_id, record)
+        results.append(report("search_index_build", n, time.perf_counter() - start, "claim"))
+
+        typed = "mary smith"
+        for status in (None, "Valid"):
+            start = time.perf_counter()
+            for i in range(1, len(typed) + 1):
+                index.search(typed[:i], status)
+            label = "search_keystroke" if status is None else "search_keystroke_valid"
+            results.append(report(label, len(typed), time.perf_counter() - start, "keystroke"))
+    return results
+
+
+@benchmark("results_db")
+def bench_results_db(sizes):
+    # The "All results" views against a SQLite results database of n claims: saving them,
+    # then one page per query, at the start and in the middle of the claims
+    import tempfile
+    from results_db import PAGE_SIZE, ClaimResultsDB
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            db = ClaimResultsDB(os.path.join(tmp, f"results{n}.sqlite"))
+            claims = synthetic_claims(n)
+            start = time.perf_counter()
+            for i in range(0, n, 10000):
+                db.put_many(claims[i:i + 10000])
+                db.commit()
+            results.append(report("results_db_save", n, time.perf_counter() - start, "claim"))
+
+            middle = claims[n // 2]
+            queries = (
+                ("results_db_page", lambda: db.search()),
+                ("results_db_page_middle", lambda: db.search(after=middle["ClaimID"])),
+                ("results_db_page_valid", lambda: db.search(status="Valid", after=middle["ClaimID"])),
+                ("results_db_ranking", lambda: db.ranking()),
+                ("results_db_ranking_middle", lambda: db.ranking(after=(middle["ClaimAmount"], middle["ClaimID"]))),
+            )
+            for label, query in queries:
+                start = time.perf_counter()
+                for _ in range(10):
+                    query()
+                results.append(report(label, 10, time.perf_counter() - start, "page"))
+
+            # One page per keystroke, as the debounced search box would run
+            typed = "mary smith"
+            start = time.perf_counter()
+            for i in range(1, len(typed) + 1):
+                db.search(typed[:i], limit=PAGE_SIZE)
+            results.append(report("results_db_search_keystroke", len(typed), time.perf_counter() - start,
+                                  "keystroke"))
+            db.close()
+    return results
+
+
+@benchmark("extraction")
+def bench_extraction(sizes):
+    # Field extraction throughput: the shared extractor against compiling and searching each pattern per form
+    import re
+    from field_extraction import extract_fields
+
+    def per_pattern(text):
+        re.search(r"Name of Insured\s*[:]?\s*([A-Za-z ]+)", text, re.IGNORECASE)
+        re.search(r"Health", text, re.IGNORECASE) or re.search(r"Auto", text, re.IGNORECASE) \
+            or re.search(r"Life", text, re.IGNORECASE)
+        re.search(r"Claim Amount\s*[:]?\s*[\$]?\s*(\d+[.,]?\d*)", text, re.IGNORECASE) \
+            or re.search(r"\$?\s*(\d+[.,]?\d*)", text)
+
+    results = []
+    for n in sizes:
+        texts = synthetic_ocr_texts(n)
+        megabytes = sum(len(text) for text in texts) / 1e6
+        for label, func in (("extraction_engine", extract_fields), ("extraction_per_pattern", per_pattern)):
+            start = time.perf_counter()
+            for text in texts:
+                func(text)
+            seconds = time.perf_counter() - start
+            results.append(report(label, n, seconds, "text"))
+            print(f"{'':<28} {megabytes / seconds:8.1f} MB/s")
+    return results
+
+
+@benchmark("validation")
+def bench_validation(sizes):
+    # Per-form claim validation alone, and extraction + validation as process_text runs them
+    from claim_processing import extract_claim, process_text, validate_claim
+
+    results = []
+    for n in sizes:
+        texts = synthetic_ocr_texts(n)
+        claims = [extract_claim(text, i) for i, text in enumerate(texts)]
+        start = time.perf_counter()
+        for claim in claims:
+            validate_claim(claim)
+        results.append(report("validate_claim", n, time.perf_counter() - start, "claim"))
+
+        start = time.perf_counter()
+        for i, text in enumerate(texts):
+            process_text(text, i)
+        results.append(report("process_text", n, time.perf_counter() - start, "text"))
+    return results
+
+
+@benchmark("record_store")
+def bench_record_store(sizes):
+    # Memory per claim and DataFrame conversion time: list of claim dicts vs ClaimRecordStore
+    import gc
+    import tracemalloc
+    import pandas as pd
+    from record_store import ClaimRecordStore
+
+    results = []
+    for n in sizes:
+        # Fresh strings per claim, as OCR produces them, so neither side shares names
+        claims = [dict(claim, Name=claim["Name"] and "".join(claim["Name"])) for claim in synthetic_claims(n)]
+
+        gc.collect()
+        tracemalloc.start()
+        as_dicts = [dict(claim) for claim in claims]
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        gc.collect()
+        tracemalloc.start()
+        store = ClaimRecordStore(claims)
+        store_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{'record_memory':<28} n={n:<8} dicts={dict_bytes / n:6.1f} B/claim  store={store_bytes / n:6.1f} B/claim")
+        results.append({"benchmark": "record_memory_dicts", "n": n, "bytes_per_item": dict_bytes / n})
+        results.append({"benchmark": "record_memory_store", "n": n, "bytes_per_item": store_bytes / n})
+
+        start = time.perf_counter()
+        pd.DataFrame(as_dicts)
+        results.append(report("to_dataframe_dicts", n, time.perf_counter() - start, "claim"))
+        start = time.perf_counter()
+        store.to_dataframe()
+        results.append(report("to_dataframe_store", n, time.perf_counter() - start, "claim"))
+    return results
+
+
+@benchmark("result_sinks")
+def bench_result_sinks(sizes):
+    # Export cost: DataFrame + to_csv at the end vs claims streamed to each sink as they arrive
+    import os
+    import tempfile
+    import tracemalloc
+    from claim_processing import build_result_frames
+    from priority_ranking import PriorityRanking
+    from record_store import ClaimRecordStore
+    from result_sinks import SINK_TYPES, SqliteSink, open_sink, pa, write_ranking
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            claims = synthetic_claims(n)
+            records = ClaimRecordStore(claims)
+            ranking = PriorityRanking((row for row in range(n) if records.is_valid(row)), key=records.priority_key)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            df, valid_claims = build_result_frames(records, ranking)
+            df.to_csv(os.path.join(tmp, "results.csv"), index=False)
+            valid_claims.to_csv(os.path.join(tmp, "ranking.csv"), index=False)
+            results.append(report("export_dataframe_csv", n, time.perf_counter() - start, "claim"))
+            results[-1]["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{'':<28} peak traced memory {results[-1]['peak_bytes'] / 2 ** 20:.1f} MB")
+
+            measured = set()
+            for extension, sink_class in SINK_TYPES.items():
+                # .db is the same sink as .sqlite
+                if (extension == ".parquet" and pa is None) or sink_class in measured:
+                    continue
+                measured.add(sink_class)
+                tracemalloc.start()
+                start = time.perf_counter()
+                with open_sink(os.path.join(tmp, "results" + extension)) as sink:
+                    for claim in claims:
+                        sink.write(claim)
+                # A results database has no ranking file; its ranking is a query
+                if sink_class is not SqliteSink:
+                    write_ranking(records, ranking, os.path.join(tmp, "ranking" + extension))
+                results.append(report(f"export_sink{extension.replace('.', '_')}", n,
+                                      time.perf_counter() - start, "claim"))
+                results[-1]["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{'':<28} peak traced memory {results[-1]['peak_bytes'] / 2 ** 20:.1f} MB")
+    return results
+
+
+@benchmark("preprocessing", max_size=100)
+def bench_preprocessing(sizes):
+    # Per-form decode + preprocessing cost: BGR decode + cvtColor + Otsu vs the grayscale
+    # pipeline, and full-size vs reduced decoding for the 300x400 preview. The sample forms
+    # are scaled to 8.5in at 300 dpi and saved as PNG and JPEG.
+    import glob
+    import os
+    import tempfile
+    import tracemalloc
+    import cv2
+    import numpy as np
+    from image_preprocessing import PreprocessingPipeline, load_preview
+
+    def legacy(data):
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+    def legacy_preview(path):
+        img = cv2.imread(path)
+        height, width = img.shape[:2]
+        scale = min(300 / width, 400 / height)
+        return cv2.resize(img, (int(width * scale), int(height * scale)))
+
+    samples = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Insurance_Input_forms", "*")))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for extension in (".png", ".jpg"):
+            paths, encoded = [], []
+            for i, sample in enumerate(samples):
+                img = cv2.imread(sample)
+                img = cv2.resize(img, None, fx=2550 / img.shape[1], fy=2550 / img.shape[1])
+                paths.append(os.path.join(tmp, f"form{i}{extension}"))
+                cv2.imwrite(paths[-1], img)
+                with open(paths[-1], "rb") as f:
+                    encoded.append(f.read())
+
+            pipeline = PreprocessingPipeline()
+            full_pipeline = PreprocessingPipeline(("deskew", "denoise", "adaptive_threshold"))
+            tag = extension.lstrip(".")
+            runs = [
+                (f"preprocess_legacy_{tag}", lambda i: legacy(encoded[i % len(encoded)])),
+                (f"preprocess_pipeline_{tag}", lambda i: pipeline.process_bytes(encoded[i % len(encoded)])),
+                (f"preprocess_all_stages_{tag}", lambda i: full_pipeline.process_bytes(encoded[i % len(encoded)])),
+                (f"preview_legacy_{tag}", lambda i: legacy_preview(paths[i % len(paths)])),
+                (f"preview_reduced_{tag}", lambda i: load_preview(paths[i % len(paths)], 300, 400)),
+            ]
+            for n in sizes:
+                for name, run in runs:
+                    start = time.perf_counter()
+                    for i in range(n):
+                        run(i)
+                    results.append(report(name, n, time.perf_counter() - start, "form"))
+
+                    # Peak memory of a single form, measured separately as tracemalloc slows decoding
+                    tracemalloc.start()
+                    run(0)
+                    results[-1]["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    print(f"{'':<28} peak traced memory per form {results[-1]['peak_bytes'] / 2 ** 20:.1f} MB")
+            for stage, (calls, total, mean_ms) in full_pipeline.timing_summary().items():
+                print(f"{'  ' + tag + ' stage ' + stage:<28} calls={calls:<6} mean={mean_ms:8.2f} ms")
+    return results
+
+
+@benchmark("navigation", max_size=100)
+def bench_navigation(sizes):
+    # Time a reviewer waits per Next/Previous click for the preview, flipping forward through
+    # n forms and back again with 150 ms between clicks: decoding on every click, as before,
+    # vs the thumbnail cache with neighbour prefetch. Forms are the samples at 300 dpi.
+    import glob
+    import os
+    import shutil
+    import tempfile
+    import cv2
+    from thumbnail_cache import ThumbnailCache, load_thumbnail, neighbours
+
+    samples = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Insurance_Input_forms", "*")))
+    think = 0.15
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for i, sample in enumerate(samples):
+            img = cv2.imread(sample)
+            sources.append(os.path.join(tmp, f"source{i}.png"))
+            cv2.imwrite(sources[-1], cv2.resize(img, None, fx=2550 / img.shape[1], fy=2550 / img.shape[1]))
+        for n in sizes:
+            # Distinct files, so nothing is shared between forms
+            forms = []
+            for i in range(n):
+                forms.append(os.path.join(tmp, f"form{n}_{i}.png"))
+                shutil.copyfile(sources[i % len(sources)], forms[-1])
+            clicks = list(range(n)) + list(range(n - 2, -1, -1))
+
+            waited = 0.0
+            for index in clicks:
+                start = time.perf_counter()
+                load_thumbnail(forms[index])
+                waited += time.perf_counter() - start
+                time.sleep(think)
+            results.append(report("navigation_decode_per_click", len(clicks), waited, "click"))
+
+            cache = ThumbnailCache()
+            waited = 0.0
+            for index in clicks:
+                start = time.perf_counter()
+                future = cache.load(forms[index])
+                cache.prefetch([forms[i] for i in neighbours(index, n)], forms[index])
+                future.result()
+                waited += time.perf_counter() - start
+                time.sleep(think)
+            results.append(report("navigation_thumbnail_cache", len(clicks), waited, "click"))
+            print(f"{'':<28} hits={cache.hits} misses={cache.misses}")
+            cache.shutdown()
+    return results
+
+
+@benchmark("multipage", max_size=100)
+def bench_multipage(sizes):
+    # Reading an n-page TIFF packet page by page: cv2.imreadmulti, which decodes the whole
+    # packet up front, vs the form_pages.iter_pages generator. Peak is the numpy memory
+    # the reader holds (tracemalloc), so PIL's transient decode buffer isn't counted.
+    import gc
+    import glob
+    import os
+    import tempfile
+    import tracemalloc
+    import cv2
+    from PIL import Image
+    from form_pages import iter_pages, read_page
+
+    samples = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Insurance_Input_forms", "*")))
+    pages = [Image.open(sample).convert("L") for sample in samples]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            packet = os.path.join(tmp, f"packet{n}.tif")
+            packet_pages = [pages[i % len(pages)] for i in range(n)]
+            packet_pages[0].save(packet, save_all=True, append_images=packet_pages[1:], compression="tiff_lzw")
+
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            _, images = cv2.imreadmulti(packet, flags=cv2.IMREAD_GRAYSCALE)
+            for img in images:
+                img.sum()
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del images
+            results.append(dict(report("multipage_imreadmulti", n, seconds, "page"), peak_bytes=peak))
+
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            for _, img in iter_pages(packet):
+                img.sum()
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append(dict(report("multipage_iter_pages", n, seconds, "page"), peak_bytes=peak))
+
+            # What each worker does for its own page of the packet
+            start = time.perf_counter()
+            for page in range(1, n + 1):
+                read_page(packet, page)
+            results.append(report("multipage_read_page", n, time.perf_counter() - start, "page"))
+            print(f"{'':<28} peak imreadmulti={results[-3]['peak_bytes'] / 2**20:.1f} MB  "
+                  f"iter_pages={results[-2]['peak_bytes'] / 2**20:.1f} MB")
+    return results
+
+
+@benchmark("zone_ocr", max_size=100)
+def bench_zone_ocr(sizes):
+    # OCR time per form for each available engine: full page vs the field zones of the
+    # matching template. pytesseract starts a tesseract process per image (per zone);
+    # tesserocr keeps the model loaded in-process; fake is the floor with no OCR at all.
+    import glob
+    import os
+    import cv2
+    from claim_processing import preprocess_image
+    from form_templates import TemplateRegistry
+    from ocr_engine import ENGINES
+
+    paths = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Insurance_Input_forms", "*")))
+    images = [preprocess_image(cv2.imread(path)).copy() for path in paths]
+
+    results = []
+    for name, engine_type in ENGINES.items():
+        try:
+            engine = engine_type()
+            engine.warm_up()
+            engine.text(images[0][:32, :32])
+        except Exception as e:
+            print(f"zone_ocr: {name} skipped ({type(e).__name__}: {e})")
+            continue
+        registry = TemplateRegistry()
+        for n in sizes:
+            start = time.perf_counter()
+            for i in range(n):
+                engine.text(images[i % len(images)])
+            results.append(report(f"ocr_full_page_{name}", n, time.perf_counter() - start, "form"))
+            # Measured for every engine that can read zones, even those that aren't given
+            # them in production because they come out slower
+            if name == "fake":
+                continue
+
+            start = time.perf_counter()
+            for i in range(n):
+                registry.read(images[i % len(images)], engine.text)
+            results.append(report(f"ocr_zones_{name}", n, time.perf_counter() - start, "form"))
+    return results
+
+
+@benchmark("pipeline", max_size=1000)
+def bench_pipeline(sizes):
+    # End-to-end batch throughput (decode, preprocessing, extraction, validation, ranking,
+    # results file) with the fake OCR engine, so it runs without tesseract. With zero
+    # latency this is the ceiling the rest of the pipeline puts on OCR; with 50 ms it
+    # shows how well the workers overlap OCR time.
+    import glob
+    import os
+    import tempfile
+    from claims_cli import run_batch
+    from priority_ranking import PriorityRanking
+    from record_store import ClaimRecordStore
+    from result_sinks import open_sink
+
+    samples = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Insurance_Input_forms", "*")))
+    saved = {name: os.environ.get(name) for name in ("CLAIMS_OCR_ENGINE", "CLAIMS_FAKE_OCR_LATENCY_MS")}
+    results = []
+    try:
+        os.environ["CLAIMS_OCR_ENGINE"] = "fake"
+        with tempfile.TemporaryDirectory() as tmp:
+            for latency_ms in (0, 50):
+                os.environ["CLAIMS_FAKE_OCR_LATENCY_MS"] = str(latency_ms)
+                for n in sizes:
+                    forms = [samples[i % len(samples)] for i in range(n)]
+                    records = ClaimRecordStore()
+                    ranking = PriorityRanking(key=records.priority_key)
+                    start = time.perf_counter()
+                    with open_sink(os.path.join(tmp, "results.csv")) as sink:
+                        run_batch(forms, cache_options={"enabled": False}, records=records, ranking=ranking,
+                                  sink=sink)
+                    results.append(report(f"pipeline_fake_ocr_{latency_ms}ms", n, time.perf_counter() - start,
+                                          "form"))
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return results
+
+
+@benchmark("claim_rules")
+def bench_claim_rules(sizes):
+    # Whole-table rule validation: ClaimRuleSet vs a Python loop over rows
+    from claim_rules import CLAIM_TYPES, validate_claims
+
+    results = []
+    for n in sizes:
+        df = synthetic_claim_table(n)
+
+        start = time.perf_counter()
+        reasons = []
+        for row in df.itertuples(index=False):
+            row_reasons = []
+            if row.ClaimType not in CLAIM_TYPES:
+                row_reasons.append("Invalid ClaimType")
+            if not 0 < row.ClaimAmount <= 1000000:
+                row_reasons.append("Invalid ClaimAmount")
+            if not 0 <= row.PatientAge <= 120:
+                row_reasons.append("Invalid PatientAge")
+            if row.ProviderSpecialty == "Pediatrics" and row.PatientAge > 17:
+                row_reasons.append("Pediatrics claim for adult patient")
+            reasons.append(", ".join(row_reasons))
+        results.append(report("claim_rules_row_loop", n, time.perf_counter() - start, "row"))
+
+        start = time.perf_counter()
+        validate_claims(df)
+        results.append(report("claim_rules_vectorized", n, time.perf_counter() - start, "row"))
+    return results
+
+
+@benchmark("duplicates")
+def bench_duplicates(sizes):
+    # Duplicate detection over a claims table with 1% resubmitted claims: the blocked detector,
+    # whole and in 10 chunks, vs comparing every pair of claims
+    import numpy as np
+    import pandas as pd
+    from duplicate_claims import DuplicateClaimDetector
+
+    results = []
+    for n in sizes:
+        df = synthetic_claim_table(n)
+        repeats = df.sample(frac=0.01, random_state=0)
+        repeats["ClaimID"] += n
+        repeats["ClaimDate"] = (pd.to_datetime(repeats["ClaimDate"]) + pd.Timedelta(days=2)).dt.strftime("%Y-%m-%d")
+        df = pd.concat([df, repeats], ignore_index=True)
+
+        start = time.perf_counter()
+        kinds, _ = DuplicateClaimDetector().check(df)
+        results.append(report("duplicates_blocked", len(df), time.perf_counter() - start, "row"))
+        print(f"{'':<28} {int((kinds > 0).sum())} flagged of {len(repeats)} resubmitted")
+
+        detector = DuplicateClaimDetector()
+        chunk = max(1, len(df) // 10)
+        start = time.perf_counter()
+        for i in range(0, len(df), chunk):
+            detector.check(df.iloc[i:i + chunk])
+        results.append(report("duplicates_blocked_chunked", len(df), time.perf_counter() - start, "row"))
+
+        if len(df) <= 5000:
+            # Quadratic, so only at small sizes
+            rows = list(df[["PatientID", "ProviderID", "ProcedureCode", "ClaimDate", "ClaimAmount"]]
+                        .itertuples(index=False))
+            days = pd.to_datetime(df["ClaimDate"]).to_numpy(dtype="datetime64[D]").astype(np.int64)
+            start = time.perf_counter()
+            for j, b in enumerate(rows):
+                for i in range(j):
+                    a = rows[i]
+                    if a[:3] == b[:3] and abs(days[j] - days[i]) <= 7 \
+                            and abs(a[4] - b[4]) <= 0.05 * max(abs(a[4]), abs(b[4])):
+                        break
+            results.append(report("duplicates_pairwise", len(df), time.perf_counter() - start, "row"))
+    return results
+
+
+@benchmark("csv_stream")
+def bench_csv_stream(sizes):
+    # Throughput and peak memory of chunked validation vs loading the whole CSV.
+    # Files are about 70 bytes per row, so --sizes 30000000 streams a ~2 GB file.
+    import os
+    import resource
+    import tempfile
+    import tracemalloc
+    import pandas as pd
+    from claim_rules import validate_claims
+    from claim_stream import stream_validate
+
+    def whole_file(path, out):
+        validate_claims(pd.read_csv(path), flagged_only=True).to_csv(out, index=False)
+
+    def traced_peak(func, *args):
+        tracemalloc.start()
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # The shipped claims table once, as a check on real data alongside the synthetic sizes
+        sample = os.path.join(os.path.dirname(os.path.abspath(__file__)), "enhanced_health_insurance_claims.csv")
+        if os.path.exists(sample):
+            start = time.perf_counter()
+            summary = stream_validate(sample, os.path.join(tmp, "sample_flagged.csv"), flagged_only=True)
+            results.append(report("csv_stream_sample_file", summary.total, time.perf_counter() - start, "row"))
+
+        for n in sizes:
+            path = os.path.join(tmp, f"claims_{n}.csv")
+            write_synthetic_claim_csv(path, n)
+            out = os.path.join(tmp, "flagged.csv")
+            print(f"{'csv_stream_file':<28} n={n:<8} size={os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+            runs = [("csv_stream_chunked", lambda: stream_validate(path, out, flagged_only=True))]
+            if n <= 2000000:
+                # Loading the whole file is exactly what the streaming path avoids
+                runs.append(("csv_stream_whole_file", lambda: whole_file(path, out)))
+            for name, run in runs:
+                start = time.perf_counter()
+                run()
+                results.append(report(name, n, time.perf_counter() - start, "row"))
+                if n <= 2000000:
+                    # tracemalloc slows pandas down several times, so peaks are measured in a separate pass
+                    peak = traced_peak(run)
+                    results[-1]["peak_bytes"] = peak
+                    print(f"{'':<28} peak traced memory {peak / 2 ** 20:.1f} MB")
+                else:
+                    print(f"{'':<28} process max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+    return results
+
+
+def run_suite(names, sizes):
+    results = []
+    for name in names:
+        max_size = MAX_SIZES[name]
+        run_sizes = [n for n in sizes if max_size is None or n <= max_size]
+        skipped = [n for n in sizes if n not in run_sizes]
+        if skipped:
+            print(f"{name}: sizes {', '.join(map(str, skipped))} skipped (limit {max_size})")
+        if run_sizes:
+            for result in BENCHMARKS[name](run_sizes):
+                result.setdefault("suite", name)
+                results.append(result)
+    return results
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def check_regressions(results, thresholds=None, baseline=None, tolerance=DEFAULT_TOLERANCE):
+    """Compare results with absolute limits and with a previous run.
+
+    thresholds maps a benchmark name to {metric: limit}, applied at sizes of
+    at least its optional "min_n" (per-item times at tiny sizes are mostly
+    fixed overhead). baseline is the results list of an earlier run; a
+    metric more than tolerance (a fraction) above the baseline's value at
+    the same size fails. Returns a message per failure.
+    """
+    failures = []
+    previous = {(result["benchmark"], result["n"]): result for result in baseline or ()}
+    for result in results:
+        name, n = result["benchmark"], result["n"]
+        limits = dict((thresholds or {}).get(name, {}))
+        if n < limits.pop("min_n", 0):
+            limits = {}
+        for metric, limit in limits.items():
+            if metric in result and result[metric] > limit:
+                failures.append(f"{name} n={n}: {metric} {result[metric]:,.2f} exceeds limit {limit:,.2f}")
+        before = previous.get((name, n), {})
+        for metric in METRICS:
+            if metric in result and before.get(metric) and result[metric] > before[metric] * (1 + tolerance):
+                failures.append(f"{name} n={n}: {metric} {result[metric]:,.2f} is "
+                                f"{result[metric] / before[metric] - 1:.0%} above baseline {before[metric]:,.2f}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Claim processing benchmarks")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Claim counts to run at")
+    parser.add_argument("--json", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown against the baseline, as a fraction (default: 0.25)")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS,
+                        help="JSON file of per-benchmark limits (default: benchmark_thresholds.json)")
+    parser.add_argument("--no-thresholds", action="store_true", help="Don't check the threshold file")
+    args = parser.parse_args(argv)
+
+    names = args.names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    thresholds = None
+    if not args.no_thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            thresholds = json.load(f)
+    baseline = load_results(args.baseline) if args.baseline else None
+
+    results = run_suite(names, args.sizes)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "sizes": args.sizes,
+                "results": results,
+            }, f, indent=1)
+
+    failures = check_regressions(results, thresholds, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
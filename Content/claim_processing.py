@@ -0,0 +1,196 @@
+import os
+import time
+
+from field_extraction import extract_fields
+from form_pages import PDF_EXTENSIONS, file_digest, read_page, split_page_ref
+from form_templates import default_registry
+from image_preprocessing import get_pipeline
+from metrics import get_metrics
+from ocr_engine import get_engine
+from ocr_cache import OcrCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tiff", ".tif", ".bmp")
+# Images plus PDFs, which are read page by page; see form_pages.expand_forms()
+FORM_EXTENSIONS = IMAGE_EXTENSIONS + PDF_EXTENSIONS
+
+# Part of every OCR cache key together with the preprocessing stages and OCR engine;
+# change it whenever tesseract options change
+TESSERACT_SETTINGS = "tesseract:default"
+
+
+def new_claim(claim_id):
+    return {"ClaimID": claim_id, "Name": None, "ClaimType": None,
+            "ClaimAmount": None, "validation_status": None, "validation_reasons": ""}
+
+
+def zone_registry():
+    # Form templates for zone OCR, or None when disabled with CLAIMS_ZONE_OCR=0 or the
+    # OCR engine only reads whole pages
+    if os.environ.get("CLAIMS_ZONE_OCR", "1") == "0" or not get_engine().zones:
+        return None
+    return default_registry
+
+
+def ocr_settings():
+    registry = zone_registry()
+    zones = f"|{registry.settings}" if registry is not None else ""
+    return f"{get_pipeline().settings}|{TESSERACT_SETTINGS}|{get_engine().name}{zones}"
+
+
+def preprocess_image(img):
+    # Preprocess image (grayscale or BGR) for better OCR; see image_preprocessing
+    return get_pipeline().run(img)
+
+
+def ocr_image(img):
+    # Extract text with the configured OCR engine, reading only the field zones of recognised layouts
+    metrics = get_metrics()
+    with metrics.time("preprocess"):
+        processed = preprocess_image(img)
+    engine = get_engine()
+    registry = zone_registry()
+    with metrics.time("ocr"):
+        if registry is not None:
+            text = registry.read(processed, engine.text)
+            if text is not None:
+                return text
+        return engine.text(processed)
+
+
+_ocr_cache = None
+_ocr_cache_configured = False
+
+
+def configure_ocr_cache(directory=None, max_bytes=None, enabled=True):
+    global _ocr_cache, _ocr_cache_configured
+    _ocr_cache_configured = True
+    if not enabled:
+        _ocr_cache = None
+        return None
+    _ocr_cache = OcrCache(directory or DEFAULT_CACHE_DIR, max_bytes or DEFAULT_MAX_BYTES)
+    return _ocr_cache
+
+
+def init_worker(*cache_args):
+    # ProcessPoolExecutor initializer: optional OCR cache settings, then load the OCR
+    # model up front so the first form doesn't pay for it
+    if cache_args:
+        configure_ocr_cache(*cache_args)
+    get_engine().warm_up()
+
+
+def get_ocr_cache():
+    if not _ocr_cache_configured:
+        # Environment lets batch runs and the GUI share or disable the cache without code changes
+        enabled = os.environ.get("CLAIMS_OCR_CACHE", "1") != "0"
+        max_mb = os.environ.get("CLAIMS_OCR_CACHE_MB")
+        configure_ocr_cache(os.environ.get("CLAIMS_OCR_CACHE_DIR"),
+                            int(max_mb) * 1024 * 1024 if max_mb else None, enabled)
+    return _ocr_cache
+
+
+def ocr_file(form_path, img=None):
+    # form_path may be a page of a multi-page file (see form_pages). Returns None when the
+    # file or page cannot be decoded as an image.
+    metrics = get_metrics()
+    path, page = split_page_ref(form_path)
+    settings = ocr_settings()
+    if page is None:
+        with metrics.time("read"):
+            with open(path, "rb") as f:
+                data = f.read()
+    else:
+        # A page is cached under the packet's digest and its page number, so a page found in
+        # the cache is never decoded; each process hashes a packet once (see file_digest)
+        data = None
+        settings = f"{settings}|page:{page}"
+
+    cache = get_ocr_cache()
+    if cache is not None:
+        with metrics.time("cache"):
+            try:
+                key = cache.key(data if page is None else file_digest(path).encode("ascii"), settings)
+            except OSError:
+                return None
+            text = cache.get(key)
+        if text is not None:
+            return text
+
+    if img is None:
+        # Decoded straight to grayscale; a colour copy of the scan is never made
+        with metrics.time("decode"):
+            img = get_pipeline().decode(data) if page is None else read_page(path, page)
+        if img is None:
+            return None
+
+    text = ocr_image(img)
+    if cache is not None:
+        with metrics.time("cache"):
+            cache.put(key, text)
+    return text
+
+
+def extract_claim(text, claim_id, extractor=None):
+    # Single pass over the OCR text for every field; see field_extraction.DEFAULT_FIELD_SPECS
+    claim = new_claim(claim_id)
+    claim.update(extract_fields(text, extractor))
+    return claim
+
+
+def validate_claim(claim):
+    reasons = []
+    if not claim["Name"]:
+        reasons.append("Missing Name")
+    if claim["ClaimAmount"] is None or claim["ClaimAmount"] <= 0:
+        reasons.append("Invalid ClaimAmount")
+    if not claim["ClaimType"]:
+        reasons.append("Invalid ClaimType")
+
+    if reasons:
+        claim["validation_status"] = "Invalid"
+        claim["validation_reasons"] = ", ".join(reasons)
+    else:
+        claim["validation_status"] = "Valid"
+    return reasons
+
+
+def process_text(text, claim_id, extractor=None):
+    # Timed by hand: both stages take microseconds, so a context manager each would be noticeable
+    start = time.perf_counter()
+    claim = extract_claim(text, claim_id, extractor)
+    extracted = time.perf_counter()
+    validate_claim(claim)
+    metrics = get_metrics()
+    metrics.observe("extract", extracted - start)
+    metrics.observe("validate", time.perf_counter() - extracted)
+    return claim
+
+
+def process_form(form_path, claim_id):
+    # Runs in worker processes, so it only takes picklable arguments. Returns the claim,
+    # the OCR text and {stage: seconds} for the parent to add to its metrics.
+    metrics = get_metrics()
+    with metrics.capture() as timings:
+        with metrics.time("form"):
+            text = ocr_file(form_path)
+            if text is None:
+                claim = new_claim(claim_id)
+                claim["validation_status"] = "Invalid"
+                claim["validation_reasons"] = "Unreadable Image"
+                text = ""
+            else:
+                claim = process_text(text, claim_id)
+    return claim, text, timings
+
+
+def build_result_frames(records, ranking=None):
+    # records is a ClaimRecordStore; ranking, if given, holds its valid rows in priority order
+    df = records.to_dataframe()
+    if ranking is not None:
+        # Already in priority order, so no filter or sort is needed
+        valid_claims = records.to_dataframe(list(ranking))
+    else:
+        valid_claims = df[df["validation_status"] == "Valid"].copy()
+        valid_claims = valid_claims.sort_values(by="ClaimAmount", ascending=False)
+    valid_claims["priority_score"] = range(1, len(valid_claims) + 1)
+    return df, valid_claims
@@ -0,0 +1,114 @@
+import os
+from collections import namedtuple
+
+import pandas as pd
+
+from claim_rules import DEFAULT_RULES, ClaimRuleSet
+
+# Explicit dtypes for the columns of enhanced_health_insurance_claims.csv, so
+# chunks are parsed without type inference and repeated strings are stored as
+# categories. Columns not listed here are read with pandas' defaults.
+CLAIM_TABLE_DTYPES = {
+    "ClaimID": object,
+    "PatientID": object,
+    "ProviderID": object,
+    "ClaimAmount": "float64",
+    "ClaimDate": object,
+    "DiagnosisCode": object,
+    "ProcedureCode": object,
+    "PatientAge": "float32",
+    "PatientGender": "category",
+    "ProviderSpecialty": "category",
+    "ClaimStatus": "category",
+    "PatientIncome": "float64",
+    "PatientMaritalStatus": "category",
+    "PatientEmploymentStatus": "category",
+    "ProviderLocation": object,
+    "ClaimType": "category",
+    "ClaimSubmissionMethod": "category",
+}
+
+DEFAULT_CHUNKSIZE = 100000
+
+# Totals for a streamed file; top holds the k highest-priority clean claims
+StreamSummary = namedtuple("StreamSummary", ["total", "flagged", "chunks", "top"])
+
+
+def iter_claim_chunks(path, chunksize=DEFAULT_CHUNKSIZE, dtypes=CLAIM_TABLE_DTYPES, usecols=None):
+    # Yields DataFrames of at most chunksize rows
+    with pd.read_csv(path, dtype=dtypes, usecols=usecols, chunksize=chunksize) as reader:
+        yield from reader
+
+
+def merge_top(top, candidates, k):
+    # Highest ClaimAmount first, ties broken by ClaimID, same as priority_ranking.priority_key;
+    # without a ClaimID column, ties keep file order (top comes before candidates, and the sort is stable)
+    if k <= 0:
+        return top
+    candidates = candidates.nlargest(k, "ClaimAmount", keep="all")
+    merged = candidates if top is None else pd.concat([top, candidates], ignore_index=True)
+    if "ClaimID" in merged:
+        return merged.sort_values(["ClaimAmount", "ClaimID"], ascending=[False, True], kind="stable").head(k)
+    return merged.sort_values("ClaimAmount", ascending=False, kind="stable").head(k)
+
+
+def stream_validate(path, out=None, rules=None, chunksize=DEFAULT_CHUNKSIZE, top_k=100, flagged_only=False,
+                    progress=None, duplicates=None):
+    """Validate a claims CSV chunk by chunk.
+
+    Each chunk is validated with the rule set, appended to out (if given) and
+    folded into a running top-k of clean claims, then dropped, so peak memory
+    depends on chunksize and top_k rather than on the size of the file.
+    With a DuplicateClaimDetector as duplicates, each chunk is also checked
+    against every claim before it and repeats are flagged like failed rules.
+    out is written next to itself and renamed into place once the whole file
+    is through, so it may not be the input itself.
+    """
+    ruleset = rules if isinstance(rules, ClaimRuleSet) else ClaimRuleSet(rules or DEFAULT_RULES)
+    partial = None
+    if out is not None:
+        if os.path.abspath(out) == os.path.abspath(path) or (os.path.exists(out) and os.path.samefile(out, path)):
+            raise ValueError(f"output {out} is the input file")
+        # Written next to out and swapped in at the end, so an interrupted run keeps the old out
+        partial = out + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+    try:
+        total, flagged, chunks, top = _validate_chunks(path, partial, ruleset, chunksize, top_k, flagged_only,
+                                                       progress, duplicates)
+    except BaseException:
+        if partial is not None and os.path.exists(partial):
+            os.remove(partial)
+        raise
+    if partial is not None:
+        if os.path.exists(partial):
+            os.replace(partial, out)
+        elif os.path.exists(out):
+            # An input with no rows leaves no output, as before
+            os.remove(out)
+
+    if top is None:
+        top = pd.DataFrame()
+    return StreamSummary(total, flagged, chunks, top.reset_index(drop=True))
+
+
+def _validate_chunks(path, out, ruleset, chunksize, top_k, flagged_only, progress, duplicates):
+    total = flagged = chunks = 0
+    top = None
+    for chunk in iter_claim_chunks(path, chunksize):
+        result = ruleset.validate(chunk)
+        if duplicates is not None:
+            result = duplicates.apply(result)
+        is_flagged = (result["FraudReason"] != "").to_numpy()
+        total += len(result)
+        flagged += int(is_flagged.sum())
+        chunks += 1
+
+        if "ClaimAmount" in result:
+            top = merge_top(top, result.loc[~is_flagged], top_k)
+        if out is not None:
+            written = result.loc[is_flagged] if flagged_only else result
+            written.to_csv(out, mode="a", header=chunks == 1, index=False)
+        if progress:
+            progress(total, flagged)
+    return total, flagged, chunks, top
@@ -0,0 +1,472 @@
+import argparse
+import csv
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from claim_processing import FORM_EXTENSIONS, process_form, init_worker
+from claim_rules import ClaimRuleSet
+from claim_stream import DEFAULT_CHUNKSIZE, stream_validate
+from duplicate_claims import DEFAULT_AMOUNT_TOLERANCE, DEFAULT_WINDOW_DAYS, DuplicateClaimDetector, missing_columns
+from form_pages import close_documents, expand_forms
+from hot_folder import DEFAULT_MAX_QUEUED, DEFAULT_POLL_SECONDS, DEFAULT_SETTLE_SECONDS, FolderWatcher, \
+    HotFolderProcessor
+from image_preprocessing import configure_preprocessing, parse_stages
+from job_ledger import JobLedger
+from metrics import get_metrics, serve_metrics
+from ocr_engine import ENGINES, configure_engine
+from priority_ranking import PriorityRanking
+from record_store import CLAIM_COLUMNS, ClaimRecordStore
+from result_sinks import DEFAULT_FLUSH_EVERY, RANKING_COLUMNS, SqliteSink, finalize_ranking, open_sink, read_sink, \
+    sink_type, write_ranking
+from results_db import ClaimResultsDB
+
+
+def find_forms(directory, recursive=False):
+    forms = []
+    if recursive:
+        for dirpath, _, filenames in os.walk(directory):
+            forms.extend(os.path.join(dirpath, name) for name in filenames)
+    else:
+        forms = [os.path.join(directory, name) for name in os.listdir(directory)]
+    # Sorted so claim IDs are reproducible between runs on the same folder
+    return sorted(f for f in forms if f.lower().endswith(FORM_EXTENSIONS))
+
+
+def worker_initargs(cache_options):
+    # Each worker opens the shared on-disk OCR cache with the same settings
+    if not cache_options:
+        return ()
+    return cache_options.get("directory"), cache_options.get("max_bytes"), cache_options.get("enabled", True)
+
+
+def run_batch(forms, workers=None, first_claim_id=101, chunksize=None, progress=None, cache_options=None,
+              records=None, ranking=None, sink=None, metrics=None, claim_ids=None, ledger=None):
+    # ranking, if given, must be keyed on the rows of records; sink receives each claim as it arrives.
+    # Per-stage timings from the workers are added to metrics (default: this process's registry).
+    # claim_ids, if given, replaces numbering from first_claim_id; ledger, if given, records each result.
+    if claim_ids is None:
+        claim_ids = range(first_claim_id, first_claim_id + len(forms))
+    if chunksize is None:
+        # Large enough to amortise pickling, small enough to keep every worker busy
+        chunksize = max(1, min(32, len(forms) // ((workers or os.cpu_count() or 1) * 4)))
+
+    if records is None:
+        records = ClaimRecordStore()
+    if metrics is None:
+        metrics = get_metrics()
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=worker_initargs(cache_options)) as executor:
+            results = executor.map(process_form, forms, claim_ids, chunksize=chunksize)
+            for form, (claim, _, timings) in zip(forms, results):
+                metrics.merge(timings)
+                metrics.form_done()
+                row = records.append(claim)
+                if sink is not None:
+                    with metrics.time("sink"):
+                        sink.write(claim)
+                if ledger is not None:
+                    ledger.record(form, claim)
+                if ranking is not None and claim["validation_status"] == "Valid":
+                    ranking.add(row)
+                done += 1
+                if progress:
+                    progress(done, len(forms))
+    finally:
+        if ledger is not None:
+            # Whatever finished is kept for the next run, even if this one fails
+            ledger.commit()
+    return records
+
+
+def batch_command(args):
+    try:
+        # Every page of a multi-page TIFF or PDF is a form with its own claim ID
+        forms = list(expand_forms(find_forms(args.directory, args.recursive)))
+    except ImportError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not forms:
+        print(f"No form images found in {args.directory}", file=sys.stderr)
+        return 1
+    if args.ranking and sink_type(args.ranking) is SqliteSink:
+        # Checked before the batch rather than when the ranking is written at the end
+        print("--ranking can't be a results database; write --out to one and use claims_cli query --ranking",
+              file=sys.stderr)
+        return 2
+
+    metrics = get_metrics()
+    metrics.reset()
+
+    def progress(done, total):
+        if done % args.progress_every == 0 or done == total:
+            print(f"Processed {done} of {total} form(s) ({metrics.throughput.rate():.1f} forms/s, "
+                  f"{metrics.throughput.overall():.1f} overall)", file=sys.stderr)
+
+    try:
+        cache_options = configure_ocr(args)
+    except (ValueError, ImportError, OSError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    server = None
+    if args.metrics_port is not None:
+        server = serve_metrics(metrics, args.metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{server.server_port}/", file=sys.stderr)
+    records = ClaimRecordStore()
+    ranking = PriorityRanking(key=records.priority_key)
+    ledger = None
+    first_claim_id = args.first_claim_id
+    if first_claim_id is None:
+        # A results database keeps the claims of earlier batches, and saving a claim ID it
+        # already holds replaces that claim; other sinks are rewritten from scratch
+        first_claim_id = next_claim_id(args.out) if sink_type(args.out) is SqliteSink else 101
+    claim_ids = range(first_claim_id, first_claim_id + len(forms))
+    finished = {}
+    if args.ledger:
+        # Claim IDs come from the ledger, and forms it already holds a current claim for are
+        # not processed again
+        ledger = JobLedger(args.ledger, first_claim_id=first_claim_id)
+        claim_ids = ledger.register(forms)
+        finished = ledger.claims(forms)
+        if finished:
+            print(f"Resuming: {len(finished)} of {len(forms)} form(s) already done", file=sys.stderr)
+    try:
+        # Results are written as each form is validated, so an interrupted batch keeps what it finished
+        with open_sink(args.out, flush_every=args.flush_every) as sink:
+            for claim in finished.values():
+                row = records.append(claim)
+                sink.write(claim)
+                if claim["validation_status"] == "Valid":
+                    ranking.add(row)
+            remaining = [(form, claim_id) for form, claim_id in zip(forms, claim_ids) if form not in finished]
+            run_batch([form for form, _ in remaining], workers=args.workers, progress=progress,
+                      cache_options=cache_options, records=records, ranking=ranking, sink=sink, metrics=metrics,
+                      claim_ids=[claim_id for _, claim_id in remaining], ledger=ledger)
+        if args.ranking:
+            write_ranking(records, ranking, args.ranking)
+    finally:
+        if ledger is not None:
+            ledger.close()
+        if args.metrics_out:
+            metrics.dump(args.metrics_out)
+        if server is not None:
+            server.shutdown()
+
+    valid = len(ranking)
+    print(f"Total: {len(records)} forms | Valid: {valid} | Invalid: {len(records) - valid}", file=sys.stderr)
+    print(metrics.format_table(), file=sys.stderr)
+    return 0
+
+
+def configure_ocr(args):
+    # Applies the options added by add_ocr_arguments() and returns the worker pool's OCR
+    # cache options. Raises ValueError, ImportError or OSError for unusable settings.
+    if args.preprocess:
+        configure_preprocessing(parse_stages(args.preprocess))
+        # Read by image_preprocessing.get_pipeline() in each worker process
+        os.environ["CLAIMS_PREPROCESS"] = args.preprocess
+    if args.full_page:
+        os.environ["CLAIMS_ZONE_OCR"] = "0"
+    # Read by ocr_engine.FakeEngine in each worker process
+    if args.fake_ocr_texts:
+        os.environ["CLAIMS_FAKE_OCR_TEXTS"] = args.fake_ocr_texts
+    if args.fake_ocr_latency_ms is not None:
+        os.environ["CLAIMS_FAKE_OCR_LATENCY_MS"] = str(args.fake_ocr_latency_ms)
+    if args.ocr_engine:
+        configure_engine(args.ocr_engine)
+        # Read by ocr_engine.get_engine() in each worker process
+        os.environ["CLAIMS_OCR_ENGINE"] = args.ocr_engine
+    return {
+        "directory": args.cache_dir,
+        "max_bytes": args.cache_mb * 1024 * 1024 if args.cache_mb else None,
+        "enabled": not args.no_cache,
+    }
+
+
+def next_claim_id(results_path, default=101):
+    # One past the highest claim ID already in a results file, so a restarted run doesn't reuse IDs
+    if not os.path.exists(results_path):
+        return default
+    if sink_type(results_path) is SqliteSink:
+        db = ClaimResultsDB(results_path)
+        try:
+            return db.next_claim_id(default)
+        finally:
+            db.close()
+    highest = max((claim["ClaimID"] for claim in read_sink(results_path) if claim["ClaimID"] is not None),
+                  default=None)
+    return default if highest is None else max(default, highest + 1)
+
+
+def init_watch_worker(*cache_args):
+    # Ctrl+C and SIGTERM reach the whole process group; the watcher finishes the forms in
+    # progress, so its workers ignore them rather than die mid-form
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    init_worker(*cache_args)
+
+
+def process_watched_form(form, claim_id):
+    # Watched files are moved away once processed, which a worker still holding one open
+    # would block on Windows, so the packets read_page() keeps open are closed after each page
+    try:
+        return process_form(form, claim_id)
+    finally:
+        close_documents()
+
+
+def watch_command(args):
+    def log(message):
+        print(f"{datetime.now():%H:%M:%S} {message}", file=sys.stderr)
+
+    try:
+        cache_options = configure_ocr(args)
+        # A long-running watcher only ever adds to its results
+        sink = open_sink(args.out, flush_every=args.flush_every, append=True)
+    except (ValueError, ImportError, OSError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    first_claim_id = args.first_claim_id if args.first_claim_id is not None else next_claim_id(args.out)
+
+    metrics = get_metrics()
+    metrics.reset()
+    server = None
+    if args.metrics_port is not None:
+        server = serve_metrics(metrics, args.metrics_port)
+        log(f"Serving metrics on http://127.0.0.1:{server.server_port}/")
+
+    executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_watch_worker,
+                                   initargs=worker_initargs(cache_options))
+    watcher = FolderWatcher(args.directory, FORM_EXTENSIONS, settle=args.settle)
+    processor = HotFolderProcessor(
+        watcher, executor, sink,
+        archive_dir=args.archive_dir or os.path.join(args.directory, "processed"),
+        failed_dir=args.failed_dir or os.path.join(args.directory, "failed"),
+        first_claim_id=first_claim_id, max_queued=args.max_queued, poll_seconds=args.poll, metrics=metrics,
+        log=log, worker=process_watched_form)
+
+    def request_stop(signum, frame):
+        if processor.stopping:
+            raise KeyboardInterrupt
+        log("Stopping once the forms in progress are saved (interrupt again to abort)")
+        processor.stop()
+
+    handlers = {signum: signal.signal(signum, request_stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+    log(f"Watching {args.directory} for forms (first claim ID {first_claim_id})")
+    try:
+        processor.run(once=args.once)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        executor.shutdown(wait=False, cancel_futures=True)
+        sink.close()
+        if args.metrics_out:
+            metrics.dump(args.metrics_out)
+        if server is not None:
+            server.shutdown()
+
+    print(f"Archived: {processor.archived} file(s) | Failed: {processor.failed} | "
+          f"Forms: {metrics.throughput.completed}", file=sys.stderr)
+    print(metrics.format_table(), file=sys.stderr)
+    return 0
+
+
+def rank_command(args):
+    ranked = finalize_ranking(args.results, args.out)
+    print(f"Ranked {ranked} valid claim(s) into {args.out}", file=sys.stderr)
+    return 0
+
+
+def query_command(args):
+    if not os.path.exists(args.database):
+        print(f"No results database at {args.database}", file=sys.stderr)
+        return 1
+    db = ClaimResultsDB(args.database)
+    try:
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        if args.ranking:
+            # Priority scores count from the top of the ranking, as in the ranking files
+            writer.writerow(RANKING_COLUMNS)
+            for score, claim in enumerate(db.ranking(limit=args.limit), 1):
+                writer.writerow([claim[column] for column in RANKING_COLUMNS[:-1]] + [score])
+        else:
+            claims = db.search(args.search, args.status, args.claim_type, args.min_amount, args.max_amount,
+                               after=args.after, limit=args.limit)
+            writer.writerow(CLAIM_COLUMNS)
+            for claim in claims:
+                writer.writerow([claim[column] for column in CLAIM_COLUMNS])
+    finally:
+        db.close()
+    return 0
+
+
+def validate_csv_command(args):
+    start = time.perf_counter()
+    last_report = [0]
+
+    def progress(done, flagged):
+        if done - last_report[0] >= args.progress_every:
+            last_report[0] = done
+            elapsed = time.perf_counter() - start
+            print(f"Validated {done} claims, {flagged} flagged ({done / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+    if args.out is None:
+        # Next to the input, so the default never overwrites a dataset such as fraudulent_claims.csv
+        args.out = os.path.splitext(args.input)[0] + "_validated.csv"
+    rules = ClaimRuleSet.from_file(args.rules) if args.rules else None
+    duplicates = None
+    if not args.no_duplicates:
+        # With an index, claims are also checked against the files validated before
+        options = dict(window_days=args.duplicate_window, amount_tolerance=args.duplicate_tolerance)
+        duplicates = DuplicateClaimDetector.load(args.duplicate_index, **options) if args.duplicate_index \
+            else DuplicateClaimDetector(**options)
+        if len(duplicates):
+            print(f"Checking against {len(duplicates)} claim(s) in {args.duplicate_index}", file=sys.stderr)
+        try:
+            with open(args.input, "r", encoding="utf-8-sig", newline="") as f:
+                missing = missing_columns(next(csv.reader(f), []))
+        except OSError as e:
+            print(e, file=sys.stderr)
+            return 2
+        if missing:
+            print(f"Not checking for duplicate claims: {args.input} has no {', '.join(missing)} column(s)",
+                  file=sys.stderr)
+            duplicates = None
+    try:
+        summary = stream_validate(args.input, args.out, rules, chunksize=args.chunksize, top_k=args.top_k,
+                                  flagged_only=args.flagged_only, progress=progress, duplicates=duplicates)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.ranking:
+        summary.top.to_csv(args.ranking, index=False)
+    if duplicates is not None and args.duplicate_index:
+        # Only once the whole file is through, so an interrupted run leaves the index as it was
+        duplicates.save(args.duplicate_index)
+
+    elapsed = time.perf_counter() - start
+    print(f"Total: {summary.total} claims | Flagged: {summary.flagged} | {summary.chunks} chunk(s) "
+          f"in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+
+def add_ocr_arguments(parser):
+    parser.add_argument("--preprocess", default=None,
+                        help="Comma-separated preprocessing stages, e.g. deskew,denoise,adaptive_threshold "
+                             "(default: otsu)")
+    parser.add_argument("--full-page", action="store_true",
+                        help="OCR whole pages instead of the field zones of known form layouts")
+    parser.add_argument("--ocr-engine", default=None, choices=["auto"] + list(ENGINES),
+                        help="OCR engine (default: tesserocr if installed, else pytesseract)")
+    parser.add_argument("--fake-ocr-texts", default=None,
+                        help="With --ocr-engine fake: recorded OCR text (.txt directory or form-feed separated file)")
+    parser.add_argument("--fake-ocr-latency-ms", type=float, default=None,
+                        help="With --ocr-engine fake: simulated OCR time per page")
+    parser.add_argument("--cache-dir", default=None, help="OCR cache directory")
+    parser.add_argument("--cache-mb", type=int, default=None, help="OCR cache size limit in MB")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-run OCR")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="claims_cli", description="Headless insurance claim processing")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="OCR and validate every form image in a directory")
+    batch.add_argument("directory", help="Directory containing form images, multi-page TIFFs or PDFs")
+    batch.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    batch.add_argument("--out", default="validation_results.csv",
+                       help="Validation results, written as forms finish (.csv, .jsonl, .parquet or .sqlite)")
+    batch.add_argument("--ranking", default=None, help="Optional priority ranking (.csv, .jsonl or .parquet)")
+    add_ocr_arguments(batch)
+    batch.add_argument("--flush-every", type=int, default=DEFAULT_FLUSH_EVERY, help="Write results every N forms")
+    batch.add_argument("--recursive", action="store_true", help="Include images in subdirectories")
+    batch.add_argument("--first-claim-id", type=int, default=None,
+                       help="Claim ID assigned to the first form (default: 101, or after the highest ID "
+                            "already in a .sqlite --out)")
+    batch.add_argument("--ledger", default=None,
+                       help="SQLite job ledger; rerun with the same ledger to resume, keeping claim IDs")
+    batch.add_argument("--progress-every", type=int, default=100, help="Report progress every N forms")
+    batch.add_argument("--metrics-out", default=None, help="Write per-stage latency metrics to this JSON file")
+    batch.add_argument("--metrics-port", type=int, default=None,
+                       help="Serve live metrics as JSON on http://127.0.0.1:PORT/ while the batch runs")
+    batch.set_defaults(func=batch_command)
+
+    watch = subparsers.add_parser("watch", help="Process forms as they are dropped into a folder")
+    watch.add_argument("directory", help="Folder to watch for form images, multi-page TIFFs or PDFs")
+    watch.add_argument("--out", default="validation_results.csv",
+                       help="Validation results, appended to as forms finish (.csv, .jsonl or .sqlite)")
+    watch.add_argument("--archive-dir", default=None,
+                       help="Where processed files are moved once saved (default: DIRECTORY/processed)")
+    watch.add_argument("--failed-dir", default=None,
+                       help="Where files that could not be processed are moved (default: DIRECTORY/failed)")
+    watch.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    watch.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS, help="Seconds between folder scans")
+    watch.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                       help="Seconds a file must stay unchanged before it is treated as fully written")
+    watch.add_argument("--max-queued", type=int, default=DEFAULT_MAX_QUEUED,
+                       help="Pages queued or in progress at once; the rest of a long file, and new files, wait")
+    watch.add_argument("--first-claim-id", type=int, default=None,
+                       help="Claim ID for the first form (default: after the highest ID already in --out)")
+    watch.add_argument("--once", action="store_true", help="Exit once the folder has nothing left to process")
+    add_ocr_arguments(watch)
+    watch.add_argument("--flush-every", type=int, default=DEFAULT_FLUSH_EVERY,
+                       help="Write results every N forms (always when a file finishes)")
+    watch.add_argument("--metrics-out", default=None, help="Write per-stage latency metrics to this JSON file on exit")
+    watch.add_argument("--metrics-port", type=int, default=None,
+                       help="Serve live metrics as JSON on http://127.0.0.1:PORT/")
+    watch.set_defaults(func=watch_command)
+
+    rank = subparsers.add_parser("rank", help="Build the priority ranking from a results file, e.g. after a crash")
+    rank.add_argument("results", help="Results written by batch (.csv, .jsonl, .parquet or .sqlite)")
+    rank.add_argument("--out", default="priority_ranking.csv", help="Priority ranking output")
+    rank.set_defaults(func=rank_command)
+
+    query = subparsers.add_parser("query", help="Query a results database (.sqlite) by its indexes")
+    query.add_argument("database", help="Results database written by batch or watch, or the GUI's")
+    query.add_argument("--search", default="", help="Text anywhere in the claim ID, name, type, status or reasons")
+    query.add_argument("--status", choices=["Valid", "Invalid"], default=None)
+    query.add_argument("--claim-type", default=None)
+    query.add_argument("--min-amount", type=int, default=None)
+    query.add_argument("--max-amount", type=int, default=None)
+    query.add_argument("--after", type=int, default=None,
+                       help="Only claims with higher IDs; pass the last ID printed to get the next page")
+    query.add_argument("--ranking", action="store_true", help="Print the top of the priority ranking instead")
+    query.add_argument("--limit", type=int, default=100, help="Claims to print")
+    query.set_defaults(func=query_command)
+
+    validate_csv = subparsers.add_parser("validate-csv", help="Validate a tabular claims CSV against the claim rules")
+    validate_csv.add_argument("input", help="Claims CSV, e.g. enhanced_health_insurance_claims.csv")
+    validate_csv.add_argument("--out", default=None,
+                              help="Output CSV with FraudReason and Priority (default: INPUT_validated.csv)")
+    validate_csv.add_argument("--rules", default=None, help="JSON file with a list of rules (default: built-in rules)")
+    validate_csv.add_argument("--flagged-only", action="store_true", help="Only write claims that fail a rule")
+    validate_csv.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows read per chunk")
+    validate_csv.add_argument("--top-k", type=int, default=100, help="Size of the priority ranking of clean claims")
+    validate_csv.add_argument("--ranking", default=None, help="Optional CSV for the top-k priority ranking")
+    validate_csv.add_argument("--progress-every", type=int, default=1000000, help="Report progress every N rows")
+    validate_csv.add_argument("--no-duplicates", action="store_true",
+                              help="Don't flag claims repeating an earlier claim's patient, provider and procedure")
+    validate_csv.add_argument("--duplicate-window", type=int, default=DEFAULT_WINDOW_DAYS,
+                              help="Most days between a claim and a repeat of it")
+    validate_csv.add_argument("--duplicate-tolerance", type=float, default=DEFAULT_AMOUNT_TOLERANCE,
+                              help="Largest amount difference of a repeat, as a fraction of the larger amount")
+    validate_csv.add_argument("--duplicate-index", default=None,
+                              help="Index (.npz) of claims from earlier files; new files are checked against "
+                                   "it and added to it")
+    validate_csv.set_defaults(func=validate_csv_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
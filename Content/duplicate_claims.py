@@ -0,0 +1,245 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Claims for the same patient, provider and procedure fall in the same block; only
+# claims within a block are ever compared
+BLOCK_COLUMNS = ["PatientID", "ProviderID", "ProcedureCode"]
+# Every column a claims table needs before its rows can be checked at all
+REQUIRED_COLUMNS = BLOCK_COLUMNS + ["ClaimDate", "ClaimAmount", "ClaimID"]
+
+DEFAULT_WINDOW_DAYS = 7
+# Largest difference between two amounts, as a fraction of the larger one
+DEFAULT_AMOUNT_TOLERANCE = 0.05
+
+# FraudReason text and Priority of the two kinds of match, as in claim_rules
+EXACT_DUPLICATE = ("Duplicate claim", 1)
+NEAR_DUPLICATE = ("Possible resubmission", 2)
+
+# Per claim: block hash, ClaimDate as days since 1970, ClaimAmount, UTF-8 ClaimID and
+# arrival order
+FIELDS = ("key", "day", "amount", "claim_id", "seq")
+
+
+def _empty_claims():
+    return {"key": np.empty(0, dtype=np.uint64), "day": np.empty(0, dtype=np.int32),
+            "amount": np.empty(0, dtype=float), "claim_id": np.empty(0, dtype="S1"),
+            "seq": np.empty(0, dtype=np.int64)}
+
+
+def _concat(parts):
+    return {field: np.concatenate([part[field] for part in parts]) for field in FIELDS}
+
+
+def _take(claims, index):
+    return {field: claims[field][index] for field in FIELDS}
+
+
+def _sorted_by_key(claims):
+    return _take(claims, np.argsort(claims["key"], kind="stable"))
+
+
+def _ranges(lo, hi):
+    # Indices lo[0]..hi[0]-1, lo[1]..hi[1]-1, ... as one array
+    counts = hi - lo
+    if not counts.sum():
+        return np.empty(0, dtype=np.intp)
+    return np.arange(counts.sum()) + np.repeat(lo - np.cumsum(counts) + counts, counts)
+
+
+def missing_columns(columns):
+    # The REQUIRED_COLUMNS not among columns; like a rule on an absent column, duplicate
+    # checks don't apply to a table lacking any of them
+    return [column for column in REQUIRED_COLUMNS if column not in columns]
+
+
+def claim_keys(df):
+    """The comparable part of each row of a claims table.
+
+    Returns the row positions that can be checked (all block columns
+    present, a parseable ClaimDate and a numeric ClaimAmount) and their
+    block hashes, dates as days since 1970, amounts and UTF-8 claim IDs.
+    """
+    blocks = df[BLOCK_COLUMNS].astype(object)
+    dates = pd.to_datetime(df["ClaimDate"], format="%Y-%m-%d", errors="coerce")
+    amounts = pd.to_numeric(df["ClaimAmount"], errors="coerce")
+    usable = np.asarray(blocks.notna().all(axis=1) & dates.notna() & amounts.notna(), dtype=bool)
+    positions = np.flatnonzero(usable)
+    # A 64-bit hash of the three columns; two different blocks sharing a hash is as
+    # unlikely as a collision among 64-bit random numbers
+    keys = pd.util.hash_pandas_object(blocks.iloc[positions], index=False).to_numpy(dtype=np.uint64)
+    days = dates.iloc[positions].to_numpy(dtype="datetime64[D]").astype(np.int32)
+    claim_ids = df["ClaimID"].iloc[positions].astype(str).str.encode("utf-8").to_numpy().astype("S")
+    return positions, {"key": keys, "day": days, "amount": amounts.iloc[positions].to_numpy(dtype=float),
+                       "claim_id": claim_ids}
+
+
+class DuplicateClaimDetector:
+    """Finds claims that repeat an earlier claim, across chunks and files.
+
+    Two claims match when they have the same patient, provider and
+    procedure, dates at most window_days apart and amounts within
+    amount_tolerance of each other; the one seen later is flagged, as a
+    "Duplicate claim" if date and amount are identical and a "Possible
+    resubmission" otherwise. Rows with the same ClaimID are one claim seen
+    twice, not duplicates.
+
+    Rather than comparing every pair, claims are grouped by a hash of their
+    block and sorted by date, so each claim is only compared with the claims
+    of its block inside the window. Claims already seen are kept in sorted
+    segments, merged like a binary counter, so checking and remembering n
+    claims costs O(n log n) overall. save() and load() keep them in a .npz
+    file, so each new claims file is checked against every earlier one.
+    """
+
+    def __init__(self, window_days=DEFAULT_WINDOW_DAYS, amount_tolerance=DEFAULT_AMOUNT_TOLERANCE):
+        self.window_days = window_days
+        self.amount_tolerance = amount_tolerance
+        # Claims seen so far, each segment sorted by key, largest first
+        self.segments = []
+        self.next_seq = 0
+
+    def __len__(self):
+        return sum(len(segment["key"]) for segment in self.segments)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        # A detector remembering the claims saved at path, or none if it doesn't exist yet
+        detector = cls(**kwargs)
+        if os.path.exists(path):
+            with np.load(path) as saved:
+                detector.segments = [{field: saved[field] for field in FIELDS}]
+            if len(detector.segments[0]["seq"]):
+                detector.next_seq = int(detector.segments[0]["seq"].max()) + 1
+        return detector
+
+    def save(self, path):
+        self._merge(0)
+        claims = self.segments[0] if self.segments else _empty_claims()
+        # Written next to the old file and swapped in, so an interrupted save keeps the old one
+        partial = path + ".partial"
+        with open(partial, "wb") as f:
+            np.savez(f, **claims)
+        os.replace(partial, path)
+
+    def _remember(self, claims):
+        if len(claims["key"]):
+            self.segments.append(_sorted_by_key(claims))
+            # Merging equal-sized neighbours keeps O(log n) segments, each claim merged O(log n) times
+            while len(self.segments) > 1 and len(self.segments[-2]["key"]) <= 2 * len(self.segments[-1]["key"]):
+                self._merge(len(self.segments) - 2)
+
+    def _merge(self, start):
+        # Merges the segments from start on into one
+        if len(self.segments) - start > 1:
+            self.segments[start:] = [_sorted_by_key(_concat(self.segments[start:]))]
+
+    def _seen(self, keys):
+        # The claims seen so far whose key is among keys (sorted and unique)
+        parts = []
+        for segment in self.segments:
+            lo = np.searchsorted(segment["key"], keys, "left")
+            hi = np.searchsorted(segment["key"], keys, "right")
+            parts.append(_take(segment, _ranges(lo, hi)))
+        return _concat(parts) if parts else _empty_claims()
+
+    def check(self, df):
+        """Compare the rows of df with each other and with every claim seen before.
+
+        The rows are then remembered, so call this once per chunk, in
+        arrival order. Returns, per row of df, the kind of match (0 for none,
+        1 for an exact duplicate, 2 for a possible resubmission) and the
+        ClaimID of the earlier claim it matches (None when it matches none).
+        A table missing any of REQUIRED_COLUMNS matches nothing.
+        """
+        kinds = np.zeros(len(df), dtype=np.int8)
+        duplicate_of = np.full(len(df), None, dtype=object)
+        if missing_columns(df.columns):
+            return kinds, duplicate_of
+        positions, new = claim_keys(df)
+        if not len(positions):
+            return kinds, duplicate_of
+        new["seq"] = np.arange(self.next_seq, self.next_seq + len(positions))
+        self.next_seq += len(positions)
+
+        seen = self._seen(np.unique(new["key"]))
+        candidates = _concat([seen, new])
+        # Position in df of each new row, -1 for claims seen before
+        row = np.concatenate([np.full(len(seen["key"]), -1), positions])
+
+        # A row with the block and ID of an earlier claim is that claim seen again: it
+        # takes the earlier claim's place in the arrival order and isn't stored twice
+        order = np.lexsort((candidates["seq"], candidates["claim_id"], candidates["key"]))
+        key, claim_id, seq = (candidates[field][order] for field in ("key", "claim_id", "seq"))
+        starts = np.concatenate([[True], (key[1:] != key[:-1]) | (claim_id[1:] != claim_id[:-1])])
+        first_seq = seq[starts][np.cumsum(starts) - 1]
+        repeated = np.zeros(len(row), dtype=bool)
+        repeated[order] = first_seq < seq
+        candidates["seq"][order] = first_seq
+
+        # Within a block, by date, then in arrival order
+        order = np.lexsort((candidates["seq"], candidates["day"], candidates["key"]))
+        claims = _take(candidates, order)
+        row = row[order]
+        key, day, amount, claim_id, seq = (claims[field] for field in FIELDS)
+
+        kind = np.zeros(len(key), dtype=np.int8)
+        match = np.full(len(key), -1)
+        # Pairs (i, i + lag) within a block and the window; a row whose pair at some lag
+        # is out of range has every larger lag out of range too, so it drops out
+        active = np.arange(len(key))
+        lag = 1
+        while True:
+            active = active[active + lag < len(key)]
+            later = active + lag
+            in_range = (key[active] == key[later]) & (day[later] - day[active] <= self.window_days)
+            active, later = active[in_range], later[in_range]
+            if not len(active):
+                break
+            # The one that arrived later is the repeat; only new rows are flagged, and a
+            # claim seen again is never a duplicate of itself
+            swap = seq[active] > seq[later]
+            first = np.where(swap, later, active)
+            second = np.where(swap, active, later)
+            pairs = (row[second] >= 0) & (seq[first] != seq[second])
+            first, second = first[pairs], second[pairs]
+
+            larger = np.maximum(np.abs(amount[first]), np.abs(amount[second]))
+            close = np.abs(amount[first] - amount[second]) <= self.amount_tolerance * larger
+            first, second = first[close], second[close]
+            exact = (day[first] == day[second]) & (amount[first] == amount[second])
+            # The nearest match in date wins, except that an exact duplicate beats a near one
+            better = (kind[second] == 0) | ((kind[second] == 2) & exact)
+            first, second, exact = first[better], second[better], exact[better]
+            # A row can be the repeat in two pairs at one lag; exact matches are written last
+            for kind_value, rows in ((2, ~exact), (1, exact)):
+                kind[second[rows]] = kind_value
+                match[second[rows]] = first[rows]
+            lag += 1
+
+        flagged = kind > 0
+        kinds[row[flagged]] = kind[flagged]
+        duplicate_of[row[flagged]] = [value.decode("utf-8") for value in claim_id[match[flagged]]]
+
+        self._remember(_take(new, ~repeated[len(seen["key"]):]))
+        return kinds, duplicate_of
+
+    def apply(self, result):
+        """Flag the duplicates among the rows of a validated chunk.
+
+        result is the output of ClaimRuleSet.validate(); matches are added
+        to its FraudReason and Priority as if they were failed rules, and the
+        ClaimID of the matched claim goes in a DuplicateOf column.
+        """
+        kinds, duplicate_of = self.check(result)
+        reasons = result["FraudReason"].to_numpy(dtype=object, copy=True)
+        priorities = result["Priority"].to_numpy(dtype=float, na_value=np.nan)
+        for kind, (name, priority) in ((1, EXACT_DUPLICATE), (2, NEAR_DUPLICATE)):
+            rows = np.flatnonzero(kinds == kind)
+            reasons[rows] = [f"{reason}, {name}" if reason else name for reason in reasons[rows]]
+            priorities[rows] = np.fmin(priorities[rows], priority)
+        result["FraudReason"] = reasons
+        result["Priority"] = pd.array(priorities, dtype="Int64") if len(result) else pd.array([], dtype="Int64")
+        result["DuplicateOf"] = duplicate_of
+        return result
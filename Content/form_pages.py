@@ -0,0 +1,233 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Multi-page TIFFs and PDFs are split into one form per page. A page is named
+# "<path>#page=<n>" (1-based), so it goes wherever a form path goes: the GUI's
+# form list, the worker pool's arguments, the OCR cache and the records index.
+TIFF_EXTENSIONS = (".tif", ".tiff")
+PDF_EXTENSIONS = (".pdf",)
+PAGE_SUFFIX = re.compile(r"#page=(\d+)$")
+
+# PDF pages are rendered at this resolution for OCR
+PDF_DPI = 300
+
+# Packets read_page() keeps open, most recently used last. Reading a packet page by page
+# then opens it once, and a TIFF remembers where each page it has walked past starts, so
+# reading every page costs one pass over the page headers rather than one per page.
+MAX_OPEN_DOCUMENTS = 2
+_documents = OrderedDict()
+# Neither pdfium nor a PIL image may be used from two threads at once
+_documents_lock = threading.RLock()
+# (path, size, mtime) -> content digest, see file_digest()
+_digests = OrderedDict()
+MAX_DIGESTS = 256
+
+
+def page_ref(path, page):
+    return f"{path}#page={page}"
+
+
+def split_page_ref(form):
+    # (path, page number) of a page reference; (form, None) for a plain form path
+    match = PAGE_SUFFIX.search(form)
+    if match is None:
+        return form, None
+    return form[:match.start()], int(match.group(1))
+
+
+def _open_pdf(path):
+    # None if the file isn't a readable PDF
+    try:
+        import pypdfium2
+    except ImportError:
+        raise ImportError("PDF forms require pypdfium2 (pip install pypdfium2)")
+    try:
+        return pypdfium2.PdfDocument(path)
+    except (OSError, pypdfium2.PdfiumError):
+        return None
+
+
+def page_count(path):
+    # Pages in a TIFF or PDF without decoding any of them; 1 for other files and for
+    # files that can't be read (they are reported as unreadable when processed)
+    lower = path.lower()
+    if lower.endswith(PDF_EXTENSIONS):
+        pdf = _open_pdf(path)
+        if pdf is None:
+            return 1
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    if lower.endswith(TIFF_EXTENSIONS):
+        from PIL import Image
+
+        try:
+            with Image.open(path) as tiff:
+                # Walks the chain of page headers only
+                return getattr(tiff, "n_frames", 1)
+        except (OSError, ValueError):
+            return 1
+    return 1
+
+
+def expand_forms(paths):
+    """Yield the forms in paths, with multi-page files replaced by their pages.
+
+    Single-page TIFFs and other images are yielded as they are, so they are
+    read exactly as before; every page of a PDF becomes a page reference.
+    Nothing is decoded, so a packet of thousands of pages costs only the
+    reference strings until its pages are read one by one.
+    """
+    for path in paths:
+        count = page_count(path)
+        if count > 1 or path.lower().endswith(PDF_EXTENSIONS):
+            for page in range(1, count + 1):
+                yield page_ref(path, page)
+        else:
+            yield path
+
+
+def _pdf_page_image(pdf, index, color, max_size):
+    page = pdf[index]
+    try:
+        scale = PDF_DPI / 72
+        if max_size is not None:
+            width, height = page.get_size()
+            scale = min(scale, max_size[0] / width, max_size[1] / height)
+        bitmap = page.render(scale=scale, grayscale=not color, rev_byteorder=False)
+        img = bitmap.to_numpy()
+    finally:
+        page.close()
+    # pdfium renders BGR(A) or single-channel gray
+    if img.ndim == 3 and img.shape[2] == 4:
+        img = img[:, :, :3]
+    elif img.ndim == 3 and img.shape[2] == 1:
+        img = img[:, :, 0]
+    return img.copy() if not img.flags.c_contiguous else img
+
+
+def _tiff_frame_image(frame, color, max_size):
+    import numpy as np
+
+    frame = frame.convert("RGB" if color else "L")
+    if max_size is not None:
+        frame.thumbnail(max_size)
+    img = np.asarray(frame)
+    # OpenCV order, as cv2.imdecode would give
+    return np.ascontiguousarray(img[:, :, ::-1]) if color else img
+
+
+def iter_pages(path, color=False, max_size=None):
+    """Yield (page reference, image) for each page of a TIFF or PDF in order.
+
+    Pages are decoded one at a time as the generator is advanced, so only
+    the current page is held in memory. Images are grayscale, or BGR with
+    color=True, like the cv2 decoders; max_size=(width, height) shrinks
+    them to fit. An unreadable file yields nothing.
+    """
+    if path.lower().endswith(PDF_EXTENSIONS):
+        pdf = _open_pdf(path)
+        if pdf is None:
+            return
+        try:
+            for index in range(len(pdf)):
+                yield page_ref(path, index + 1), _pdf_page_image(pdf, index, color, max_size)
+        finally:
+            pdf.close()
+        return
+
+    from PIL import Image, ImageSequence
+
+    try:
+        tiff = Image.open(path)
+    except (OSError, ValueError):
+        return
+    with tiff:
+        for index, frame in enumerate(ImageSequence.Iterator(tiff)):
+            yield page_ref(path, index + 1), _tiff_frame_image(frame, color, max_size)
+
+
+def _signature(path):
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+def _document(path):
+    # The open PdfDocument or PIL image of path, reopened when the file has changed; None
+    # if it can't be read. Call with _documents_lock held.
+    try:
+        signature = _signature(path)
+    except OSError:
+        return None
+    document = _documents.get(signature)
+    if document is not None:
+        _documents.move_to_end(signature)
+        return document
+    if path.lower().endswith(PDF_EXTENSIONS):
+        document = _open_pdf(path)
+    else:
+        from PIL import Image
+
+        try:
+            document = Image.open(path)
+        except (OSError, ValueError):
+            document = None
+    if document is None:
+        return None
+    _documents[signature] = document
+    while len(_documents) > MAX_OPEN_DOCUMENTS:
+        _documents.popitem(last=False)[1].close()
+    return document
+
+
+def close_documents():
+    # Closes the packets read_page() keeps open, e.g. before they are moved or deleted
+    with _documents_lock:
+        while _documents:
+            _documents.popitem()[1].close()
+
+
+def read_page(path, page, color=False, max_size=None):
+    # One page of a TIFF or PDF as iter_pages would yield it, or None if it can't be read.
+    # Seeking a TIFF reads the page headers before it but decodes only this page; the file
+    # stays open for the next page until close_documents().
+    with _documents_lock:
+        document = _document(path)
+        if document is None:
+            return None
+        if path.lower().endswith(PDF_EXTENSIONS):
+            if not 1 <= page <= len(document):
+                return None
+            return _pdf_page_image(document, page - 1, color, max_size)
+        try:
+            document.seek(page - 1)
+            return _tiff_frame_image(document, color, max_size)
+        except (OSError, ValueError, EOFError):
+            return None
+
+
+def file_digest(path):
+    """SHA-256 of the file at path, as a hex string.
+
+    Remembered by path, size and modification time, so a packet read page
+    by page is hashed once per process rather than once per page.
+    """
+    signature = _signature(path)
+    with _documents_lock:
+        digest = _digests.get(signature)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        with _documents_lock:
+            _digests[signature] = digest
+            while len(_digests) > MAX_DIGESTS:
+                _digests.popitem(last=False)
+    return digest
+
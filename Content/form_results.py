@@ -0,0 +1,75 @@
+import os
+
+from form_pages import split_page_ref
+
+
+def file_signature(path):
+    # (size, modification time) of a form file, or None if it can't be read. The pages of
+    # a multi-page file share its signature.
+    try:
+        st = os.stat(split_page_ref(path)[0])
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class FormResults:
+    """Which row of a ClaimRecordStore holds each form's claim.
+
+    Entries are keyed by form path and remember the claim ID and the file's
+    signature when it was read, so a form is only extracted again once it
+    has changed on disk or been given another claim ID. The OCR text of
+    previewed forms is kept alongside, so going back to one doesn't touch
+    the file at all. One entry per distinct form, however often it is shown.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # path -> (signature, claim_id, row)
+        self.entries = {}
+        self.texts = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def lookup(self, path, claim_id):
+        # Row of the form's claim, or None when it has none yet or the one it has is out of date
+        entry = self.entries.get(path)
+        if entry is None or entry[1] != claim_id or entry[0] != file_signature(path):
+            return None
+        return entry[2]
+
+    def row(self, path):
+        # Row of the form's claim even if out of date, so it can be replaced rather than duplicated
+        entry = self.entries.get(path)
+        return None if entry is None else entry[2]
+
+    def text(self, path):
+        return self.texts.get(path)
+
+    def put(self, path, signature, claim_id, row):
+        self.entries[path] = (signature, claim_id, row)
+        # Any text kept was read before the claim changed
+        self.texts.pop(path, None)
+
+    def set_text(self, path, text):
+        if path in self.entries:
+            self.texts[path] = text
+
+    def retain(self, records, paths):
+        # Keeps only the claims of paths (which must all have entries), stored in that order
+        # in records, a ClaimRecordStore that is rebuilt without any other rows
+        claims = [records[self.entries[path][2]].to_dict() for path in paths]
+        entries, texts = self.entries, self.texts
+        records.clear()
+        self.clear()
+        for path, claim in zip(paths, claims):
+            signature, claim_id, _ = entries[path]
+            self.put(path, signature, claim_id, records.append(claim))
+            if path in texts:
+                self.texts[path] = texts[path]
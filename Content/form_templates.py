@@ -0,0 +1,131 @@
+import hashlib
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+# One region of a form to OCR on its own. box is (left, top, right, bottom) as
+# fractions of the page, so templates work at any scan resolution. The text
+# found is written out as "<label> <text>" so field_extraction's patterns pick
+# it up exactly as they would from a full page.
+FieldZone = namedtuple("FieldZone", ["field", "box", "psm", "whitelist", "label"])
+FieldZone.__new__.__defaults__ = (7, None, "")
+
+# A known form layout: pages with a matching aspect ratio whose heading zone
+# contains every keyword are read zone by zone
+FormTemplate = namedtuple("FormTemplate", ["name", "aspect", "heading", "keywords", "zones"])
+
+DIGITS = "0123456789"
+
+# Layout of Insurance_Input_forms/form1.png-form3.png (1536x1024). Boxes leave
+# some margin around each value because scans are often a few degrees skewed,
+# and the value zones use sparse-text mode (psm 11), which ignores the stray
+# table rules such a margin takes in. Whitelists drop the spaces between
+# words with the LSTM engine, so they are only used for numbers.
+HEALTH_CLAIM_FORM = FormTemplate(
+    name="health_claim_form",
+    aspect=1536 / 1024,
+    heading=FieldZone("Heading", (0.15, 0.09, 0.85, 0.23), 7),
+    keywords=("insurance", "claim", "form"),
+    # Name goes last: its pattern runs across line breaks, so an empty name
+    # would otherwise pick up the next label
+    zones=(
+        FieldZone("ClaimAmount", (0.52, 0.505, 0.88, 0.575), 11, DIGITS + "$.,-", "Claim Amount:"),
+        FieldZone("Name", (0.12, 0.295, 0.49, 0.37), 11, None, "Name of Insured:"),
+    ),
+)
+
+ASPECT_TOLERANCE = 0.05
+
+
+def crop(img, box):
+    height, width = img.shape[:2]
+    left, top, right, bottom = box
+    return img[int(top * height):int(bottom * height), int(left * width):int(right * width)]
+
+
+def remove_rules(img):
+    # Whiten table borders caught in a crop (runs of ink longer than a tenth of the
+    # width or half the height), which tesseract otherwise reads as stray characters
+    ink = 255 - img
+    height, width = img.shape[:2]
+    horizontal = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, width // 10), 1))
+    vertical = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(15, height // 2)))
+    rules = cv2.morphologyEx(ink, cv2.MORPH_OPEN, horizontal) | cv2.morphologyEx(ink, cv2.MORPH_OPEN, vertical)
+    return cv2.bitwise_or(img, cv2.dilate(rules, np.ones((3, 3), np.uint8)))
+
+
+def heading_matches(text, keywords):
+    # Spacing in large headings is unreliable, so compare letters only
+    letters = re.sub(r"[^a-z]", "", text.lower())
+    return all(keyword in letters for keyword in keywords)
+
+
+class TemplateRegistry:
+    """Known form layouts, tried in registration order.
+
+    read() OCRs the heading and every field zone of the first template whose
+    aspect ratio fits, all in parallel, and returns text made of the heading
+    plus one labelled line per field. It returns None when no template's
+    heading matches, and the caller falls back to full-page OCR.
+    """
+
+    def __init__(self, templates=(HEALTH_CLAIM_FORM,), max_workers=4):
+        self.templates = []
+        self.max_workers = max_workers
+        self.executor = None
+        for template in templates:
+            self.register(template)
+
+    def register(self, template):
+        self.templates.append(template)
+
+    @property
+    def settings(self):
+        # Identifies the templates for the OCR cache key. The digest covers each template's
+        # aspect, heading, keywords and zones (boxes, psm, whitelist, label), so editing a
+        # template without renaming it doesn't serve text read with the old layout.
+        digest = hashlib.sha256(repr(self.templates).encode("utf-8")).hexdigest()[:16]
+        return "zones:" + ",".join(template.name for template in self.templates) + ":" + digest
+
+    def candidates(self, img):
+        height, width = img.shape[:2]
+        aspect = width / height
+        return [template for template in self.templates
+                if abs(aspect - template.aspect) <= template.aspect * ASPECT_TOLERANCE]
+
+    def read(self, img, ocr):
+        # ocr(image, psm, whitelist) returns the text of one crop, e.g. an ocr_engine engine's text()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        for template in self.candidates(img):
+            zones = (template.heading,) + template.zones
+            crops = [crop(img, template.heading.box)] + [remove_rules(crop(img, zone.box)) for zone in template.zones]
+            futures = [self.executor.submit(ocr, image, zone.psm, zone.whitelist) for image, zone in zip(crops, zones)]
+            try:
+                heading = futures[0].result()
+            except BaseException:
+                self._abandon(futures)
+                raise
+            if not heading_matches(heading, template.keywords):
+                self._abandon(futures)
+                continue
+
+            lines = [" ".join(heading.split())]
+            for zone, future in zip(template.zones, futures[1:]):
+                lines.append(f"{zone.label} {' '.join(future.result().split())}".strip())
+            return "\n".join(lines) + "\n"
+        return None
+
+    @staticmethod
+    def _abandon(futures):
+        # Zones already running are waited for: the caller goes on to OCR the same image
+        # (or reuses its preprocessing buffer for the next form) as soon as read() returns
+        for future in futures:
+            future.cancel()
+        wait(futures)
+
+
+default_registry = TemplateRegistry()
@@ -0,0 +1,223 @@
+import os
+import shutil
+import time
+from collections import deque
+
+from background_processing import FormBatchRunner
+from form_pages import expand_forms, split_page_ref
+from metrics import get_metrics
+
+DEFAULT_POLL_SECONDS = 1.0
+# Scanners write a file in pieces, so it is left alone until it has stopped changing
+DEFAULT_SETTLE_SECONDS = 2.0
+# Pages queued or in progress at once; pages beyond that wait, and new files stay in the folder
+DEFAULT_MAX_QUEUED = 64
+
+
+class FolderWatcher:
+    """Finds form files in a folder once they have been fully written.
+
+    Each poll() lists the folder (not its subfolders) and returns the files
+    whose size and modification time haven't changed for settle seconds,
+    oldest first. A file is only returned once: it stays claimed until
+    release(), which the caller does after moving it out of the folder.
+    Hidden files and other extensions, such as a scanner's partial
+    downloads, are ignored.
+    """
+
+    def __init__(self, directory, extensions, settle=DEFAULT_SETTLE_SECONDS):
+        self.directory = directory
+        self.extensions = tuple(extensions)
+        self.settle = settle
+        # path -> (signature, monotonic time it was first seen with that signature)
+        self.unsettled = {}
+        self.claimed = set()
+
+    def poll(self, limit=None):
+        now = time.monotonic()
+        seen = {}
+        ready = []
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if name.startswith(".") or not name.lower().endswith(self.extensions) or entry.path in self.claimed:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                # Removed or renamed since the listing
+                continue
+            signature = (st.st_size, st.st_mtime_ns)
+            previous = self.unsettled.get(entry.path)
+            since = previous[1] if previous is not None and previous[0] == signature else now
+            seen[entry.path] = (signature, since)
+            if st.st_size and now - since >= self.settle:
+                ready.append((st.st_mtime_ns, entry.path))
+        ready = [path for _, path in sorted(ready)][:limit]
+        for path in ready:
+            del seen[path]
+            self.claimed.add(path)
+        # Files that disappeared are forgotten
+        self.unsettled = seen
+        return ready
+
+    @property
+    def waiting(self):
+        # Files seen but not yet settled or not yet taken; empty files don't count until written to
+        return sum(1 for signature, _ in self.unsettled.values() if signature[0])
+
+    def release(self, path):
+        self.claimed.discard(path)
+
+
+def move_to(path, directory):
+    # Moves path into directory without overwriting an earlier file of the same name
+    os.makedirs(directory, exist_ok=True)
+    stem, extension = os.path.splitext(os.path.basename(path))
+    target = os.path.join(directory, stem + extension)
+    suffix = 1
+    while os.path.exists(target):
+        target = os.path.join(directory, f"{stem}-{suffix}{extension}")
+        suffix += 1
+    shutil.move(path, target)
+    return target
+
+
+class HotFolderProcessor:
+    """Processes forms as they arrive in a folder and archives them once saved.
+
+    Files found by a FolderWatcher are split into pages and fed to a
+    FormBatchRunner, which keeps a bounded number of pages in the worker
+    pool. At most max_queued pages are queued or in progress: a file's pages
+    go to the runner as room frees up, so one long PDF doesn't overshoot the
+    limit, and new files are only taken once every page of the files before
+    them has gone in, so a burst of scans stays on disk instead of in memory. Each
+    page's claim goes to the sink; once every page of a file is written
+    and the sink flushed, the file is moved to archive_dir, or to
+    failed_dir if any page raised. stop() finishes the files already taken
+    and then makes run() return.
+    """
+
+    def __init__(self, watcher, executor, sink, archive_dir, failed_dir, first_claim_id=101,
+                 max_queued=DEFAULT_MAX_QUEUED, poll_seconds=DEFAULT_POLL_SECONDS, metrics=None, log=None,
+                 worker=None):
+        self.watcher = watcher
+        self.runner = FormBatchRunner(executor, [], worker=worker)
+        self.sink = sink
+        self.archive_dir = archive_dir
+        self.failed_dir = failed_dir
+        self.next_claim_id = first_claim_id
+        self.max_queued = max_queued
+        self.poll_seconds = poll_seconds
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.log = log or (lambda message: None)
+        # path -> [pages not finished yet, whether any page failed]
+        self.files = {}
+        # Files claimed from the watcher but not split into pages yet, and the (page, claim ID)
+        # of taken files that haven't gone to the runner yet
+        self.taken = deque()
+        self.backlog = deque()
+        self.stopping = False
+        self.archived = 0
+        self.failed = 0
+
+    @property
+    def queued(self):
+        return len(self.runner.pending) + len(self.runner.in_flight)
+
+    @property
+    def idle(self):
+        return not self.files and not self.taken and not self.watcher.waiting
+
+    def stop(self):
+        self.stopping = True
+
+    def feed(self):
+        # Pages of files already taken go to the runner while there is room, even when stopping
+        room = min(self.max_queued - self.queued, len(self.backlog))
+        if room > 0:
+            pages = [self.backlog.popleft() for _ in range(room)]
+            self.runner.add([form for form, _ in pages], [claim_id for _, claim_id in pages])
+
+    def scan(self):
+        self.feed()
+        if self.stopping:
+            return
+        polled = False
+        while not self.backlog and self.queued < self.max_queued:
+            if not self.taken:
+                if polled:
+                    return
+                # Every file has at least one page, so no more files than there is room for
+                self.taken.extend(self.watcher.poll(self.max_queued - self.queued))
+                polled = True
+                if not self.taken:
+                    return
+            path = self.taken.popleft()
+            try:
+                forms = list(expand_forms([path]))
+            except ImportError as e:
+                # Without the optional PDF reader; the file is left for a later run
+                self.log(f"Skipping {path}: {e}")
+                continue
+            if not forms:
+                # A PDF without pages
+                self.finish_file(path, True)
+                continue
+            # A file's claim IDs are consecutive even when its pages go in over several scans
+            claim_ids = range(self.next_claim_id, self.next_claim_id + len(forms))
+            self.next_claim_id += len(forms)
+            self.files[path] = [len(forms), False]
+            self.backlog.extend(zip(forms, claim_ids))
+            self.feed()
+
+    def collect(self, form, claim_id, result, error):
+        path = split_page_ref(form)[0]
+        state = self.files[path]
+        if error is not None:
+            state[1] = True
+            self.log(f"Error processing {form}: {error}")
+        else:
+            claim, _, timings = result
+            self.metrics.merge(timings)
+            with self.metrics.time("sink"):
+                self.sink.write(claim)
+        self.metrics.form_done()
+        state[0] -= 1
+        if not state[0]:
+            del self.files[path]
+            self.finish_file(path, state[1])
+
+    def finish_file(self, path, failed):
+        # Claims must be on disk before the input disappears from the folder
+        self.sink.flush()
+        try:
+            target = move_to(path, self.failed_dir if failed else self.archive_dir)
+        except OSError as e:
+            # Still claimed by the watcher, so it isn't picked up again by this run
+            self.log(f"Could not move {path}: {e}")
+            return
+        self.watcher.release(path)
+        if failed:
+            self.failed += 1
+        else:
+            self.archived += 1
+        self.log(f"{'Failed' if failed else 'Processed'} {os.path.basename(path)} -> {target}")
+
+    def run(self, once=False):
+        # With once, returns as soon as the folder has nothing left to process
+        next_scan = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= next_scan:
+                self.scan()
+                next_scan = now + self.poll_seconds
+            if self.stopping and not self.files:
+                return
+            if once and self.idle:
+                return
+            for finished in self.runner.drain(timeout=max(0.0, next_scan - time.monotonic())):
+                self.collect(*finished)
+            self.feed()
+            self.runner.pump()
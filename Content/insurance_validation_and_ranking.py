@@ -1,16 +1,17 @@
-import cv2
-import pytesseract
-import pandas as pd
-import re
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-from PIL import Image, ImageTk
-import numpy as np
 import os
+import time
 from datetime import datetime
 
-# Set Tesseract path (update this for your system)
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+from background_processing import FormBatchRunner, create_executor, start_warm_up
+from form_results import FormResults, file_signature
+from metrics import get_metrics
+from priority_ranking import PriorityRanking
+from record_store import ClaimRecordStore
+from results_db import ResultPager, get_results_db
+from search_index import ClaimSearchIndex
+from thumbnail_cache import ThumbnailCache, neighbours
 
 class InsuranceClaimProcessor:
     def __init__(self, root):
@@ -21,13 +22,44 @@ class InsuranceClaimProcessor:
         
         # Initialize variables
         self.forms = []
-        self.records = []
-        self.claim_id_counter = 101
+        self.records = ClaimRecordStore()
+        # Claim ID of each form, from the job ledger so a form keeps its ID in every session
+        # (numbered from first_claim_id when the ledger is disabled)
+        self.claim_ids = []
+        self.first_claim_id = 101
+        self.ledger = None
+        self.form_results = FormResults()
+        # Every claim is also saved to the results database, which the "All results" scope
+        # shows a page at a time (None until forms are loaded, or when disabled)
+        self.results_db = None
+        self.result_pager = None
+        self.ranking_pager = None
         self.current_image_index = -1
         self.current_image = None
+        self.thumbnails = ThumbnailCache()
+        self.executor = None
+        self.runner = None
+        self.sink = None
+        self.metrics = get_metrics()
+        
+        # Rows waiting to be drawn, the live ranking of valid rows and their priority_tree items
+        self.pending_records = []
+        self.redraw_scheduled = False
+        self.ranking = PriorityRanking(key=self.records.priority_key)
+        self.priority_items = {}
+        self.valid_count = 0
+        
+        # Search index over the records plus pending debounce/render callbacks
+        self.search_index = ClaimSearchIndex()
+        self.search_job = None
+        self.render_job = None
         
         # Create GUI
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Heavy libraries are imported where first used; load them once the window has been drawn
+        self.root.after_idle(start_warm_up)
         
     def create_widgets(self):
         # Main frame
@@ -55,6 +87,14 @@ class InsuranceClaimProcessor:
         ttk.Button(main_frame, text="Export Results", command=self.export_results).grid(row=2, column=1, pady=10, sticky=tk.W)
         ttk.Button(main_frame, text="Clear All", command=self.clear_all).grid(row=2, column=2, pady=10, sticky=tk.W)
         
+        # Background processing controls
+        control_frame = ttk.Frame(main_frame)
+        control_frame.grid(row=2, column=3, pady=10, sticky=tk.W)
+        self.pause_button = ttk.Button(control_frame, text="Pause", command=self.toggle_pause, state=tk.DISABLED)
+        self.pause_button.grid(row=0, column=0, padx=(0, 5))
+        self.cancel_button = ttk.Button(control_frame, text="Cancel", command=self.cancel_processing, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1)
+        
         # Image preview
         ttk.Label(main_frame, text="Form Preview:", font=("Arial", 10, "bold")).grid(row=3, column=0, sticky=tk.W, pady=(20, 5))
         self.image_label = ttk.Label(main_frame, text="No image selected", background="white", anchor="center")
@@ -85,6 +125,17 @@ class InsuranceClaimProcessor:
         # Results section
         ttk.Label(main_frame, text="Processing Results:", font=("Arial", 10, "bold")).grid(row=9, column=0, sticky=tk.W, pady=(20, 5))
         
+        # Scope of both result tabs: this session's forms, or every claim in the results database
+        scope_frame = ttk.Frame(main_frame)
+        scope_frame.grid(row=9, column=2, sticky=tk.E, pady=(20, 5))
+        ttk.Label(scope_frame, text="Show:").grid(row=0, column=0, padx=(0, 5))
+        self.scope_var = tk.StringVar()
+        scope_combo = ttk.Combobox(scope_frame, textvariable=self.scope_var,
+                                   values=["This session", "All results"], state="readonly", width=12)
+        scope_combo.set("This session")
+        scope_combo.grid(row=0, column=1)
+        scope_combo.bind("<<ComboboxSelected>>", self.change_scope)
+        
         # Notebook for tabs
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.grid(row=10, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(5, 10))
@@ -145,6 +196,8 @@ class InsuranceClaimProcessor:
         self.validation_results_tree.tag_configure("valid", background="#d4edda")  # Light green
         self.validation_results_tree.tag_configure("invalid", background="#f8d7da")  # Light red
         
+        self.result_pager_controls = self.create_pager(validation_frame, "results")
+        
         self.notebook.add(validation_frame, text="Validation Results")
         
         # Priority ranking frame
@@ -174,12 +227,15 @@ class InsuranceClaimProcessor:
         
         # Add scrollbar
         priority_scrollbar = ttk.Scrollbar(priority_tree_frame, orient="vertical", command=self.priority_tree.yview)
-        self.priority_tree.configure(yscrollcommand=priority_scrollbar.set)
+        self.priority_tree.configure(yscrollcommand=lambda first, last: self.on_priority_scroll(priority_scrollbar, first, last))
         
         self.priority_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         priority_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        self.ranking_pager_controls = self.create_pager(priority_frame, "ranking")
+        
         self.notebook.add(priority_frame, text="Priority Ranking")
+        self.notebook.bind("<<NotebookTabChanged>>", lambda event: self.root.after_idle(self.refresh_visible_priorities))
         
         # Status bar
         self.status_var = tk.StringVar()
@@ -200,32 +256,107 @@ class InsuranceClaimProcessor:
         self.progress = ttk.Progressbar(stats_frame, mode='determinate')
         self.progress.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=(10, 0))
         
+    def create_pager(self, parent, view):
+        # Previous/Next controls under a result tab, used in the "All results" scope
+        pager_frame = ttk.Frame(parent)
+        pager_frame.pack(fill=tk.X, pady=(5, 0))
+        label_var = tk.StringVar()
+        previous_button = ttk.Button(pager_frame, text="Previous Page", state=tk.DISABLED,
+                                     command=lambda: self.turn_page(view, -1))
+        previous_button.pack(side=tk.LEFT)
+        next_button = ttk.Button(pager_frame, text="Next Page", state=tk.DISABLED,
+                                 command=lambda: self.turn_page(view, 1))
+        next_button.pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Label(pager_frame, textvariable=label_var, font=("Arial", 9)).pack(side=tk.LEFT, padx=(10, 0))
+        return label_var, previous_button, next_button
+        
     def upload_forms(self):
         filepaths = filedialog.askopenfilenames(
             title="Select Form Images",
-            filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.tiff;*.bmp"), ("All files", "*.*")]
+            filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.tiff;*.tif;*.bmp"), ("PDF files", "*.pdf"),
+                       ("All files", "*.*")]
         )
         
         if filepaths:
-            self.forms = list(filepaths)
-            self.status_var.set(f"Loaded {len(self.forms)} form(s)")
+            from form_pages import expand_forms
+            
+            # Each page of a multi-page TIFF or PDF becomes a form of its own
+            try:
+                forms = list(expand_forms(filepaths))
+            except ImportError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            self.forms = forms
+            self.claim_ids = self.register_forms(forms)
+            self.thumbnails.clear()
+            if len(forms) == len(filepaths):
+                self.status_var.set(f"Loaded {len(forms)} form(s)")
+            else:
+                self.status_var.set(f"Loaded {len(forms)} form(s) from {len(filepaths)} file(s)")
             self.current_image_index = 0
             self.show_image()
             
+    def register_forms(self, forms):
+        from job_ledger import get_ledger
+        
+        self.ledger = get_ledger()
+        db = self.open_results_db()
+        # New forms are numbered after the claims already saved, so they don't replace earlier
+        # sessions' results, even ones saved without the ledger or before it was deleted
+        first = self.first_claim_id if db is None else db.next_claim_id(self.first_claim_id)
+        if self.ledger is None:
+            return list(range(first, first + len(forms)))
+        return self.ledger.register(forms, first_claim_id=first)
+        
+    def open_results_db(self):
+        if self.results_db is None:
+            self.results_db = get_results_db()
+            if self.results_db is not None:
+                self.ranking_pager = ResultPager(self.results_db.ranking,
+                                                 key=lambda claim: (claim["ClaimAmount"], claim["ClaimID"]))
+        return self.results_db
+        
     def show_image(self):
         if not self.forms or self.current_image_index < 0:
             return
             
-        image_path = self.forms[self.current_image_index]
-        self.current_image = cv2.imread(image_path)
+        # Thumbnails are decoded on the cache's thread at reduced resolution (OCR decodes the
+        # file itself in grayscale), and the forms around this one are queued up behind it
+        index = self.current_image_index
+        path = self.forms[index]
+        future = self.thumbnails.load(path)
+        self.thumbnails.prefetch([self.forms[i] for i in neighbours(index, len(self.forms))], path)
+        if future.done():
+            self.display_image(future.result())
+        else:
+            self.image_label.configure(image="", text="Loading...")
+            self.image_label.image = None
+            self.status_var.set(f"Loading image {index + 1} of {len(self.forms)}")
+            self.root.after(20, self.poll_image, index, path, future)
+            
+    def poll_image(self, index, path, future):
+        # Dropped if the reviewer has moved to another form (or loaded new ones) meanwhile
+        if index != self.current_image_index or index >= len(self.forms) or self.forms[index] != path:
+            return
+        if future.cancelled():
+            self.show_image()
+        elif future.done():
+            self.display_image(future.result())
+        else:
+            self.root.after(20, self.poll_image, index, path, future)
+            
+    def display_image(self, image):
+        from PIL import ImageTk
         
-        # Resize image for display
-        display_image = self.resize_image(self.current_image, 300, 400)
+        self.current_image = image
+        if self.current_image is None:
+            self.image_label.configure(image="", text="Unable to read image")
+            self.image_label.image = None
+            self.status_var.set(f"Image {self.current_image_index + 1} of {len(self.forms)} could not be read")
+            return
         
-        # Convert to PIL format and then to ImageTk format
-        display_image = cv2.cvtColor(display_image, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(display_image)
-        tk_image = ImageTk.PhotoImage(pil_image)
+        # Tk images can only be made on the main thread
+        tk_image = ImageTk.PhotoImage(self.current_image)
         
         # Update image label
         self.image_label.configure(image=tk_image, text="")
@@ -237,326 +368,535 @@ class InsuranceClaimProcessor:
         # Extract and show text
         self.extract_text()
         
-    def resize_image(self, image, max_width, max_height):
-        height, width = image.shape[:2]
-        
-        if width > max_width or height > max_height:
-            # Calculate scaling factor
-            scale = min(max_width/width, max_height/height)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            
-            # Resize the image
-            return cv2.resize(image, (new_width, new_height))
-        return image
-        
     def extract_text(self):
         if self.current_image is None:
             return
             
-        # Preprocess image for better OCR
-        gray = cv2.cvtColor(self.current_image, cv2.COLOR_BGR2GRAY)
-        thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        
-        # Extract text using Tesseract
-        text = pytesseract.image_to_string(thresh)
-        
+        # A form is read and extracted once, by its first preview or by Process All Forms,
+        # and the claim is reused until the file changes
+        path = self.forms[self.current_image_index]
+        claim_id = self.claim_ids[self.current_image_index]
+        row = self.form_results.lookup(path, claim_id)
+        text = self.form_results.text(path) if row is not None else None
+        if text is None:
+            from claim_processing import ocr_file
+            
+            # Preprocess and extract text using Tesseract, reusing cached text for identical images
+            signature = file_signature(path)
+            text = ocr_file(path)
+            if text is None and row is None:
+                return
+                
         # Display extracted text
         self.text_area.delete(1.0, tk.END)
-        self.text_area.insert(tk.END, text)
-        
+        self.text_area.insert(tk.END, text or "")
+        
+        if row is None:
+            from claim_processing import process_text
+            claim = process_text(text, claim_id)
+            row = self.store_form_record(path, signature, claim)
+            if self.ledger is not None:
+                self.ledger.record(path, claim)
+        if text is not None:
+            self.form_results.set_text(path, text)
+            
         # Validate the form
-        self.validate_form(text)
+        self.validate_form(self.records[row])
         
-    def validate_form(self, text):
+    def validate_form(self, claim):
         # Clear previous validation results
         for item in self.validation_tree.get_children():
             self.validation_tree.delete(item)
             
-        claim = {"ClaimID": self.claim_id_counter, "Name": None, "ClaimType": None,
-                 "ClaimAmount": None, "validation_status": None, "validation_reasons": ""}
-        
-        # Extract name
-        name_match = re.search(r"Name of Insured\s*[:]?\s*([A-Za-z ]+)", text, re.IGNORECASE)
-        if name_match:
-            claim["Name"] = name_match.group(1).strip()
+        if claim["Name"]:
             self.validation_tree.insert("", "end", values=("Name", "✓ Found", claim["Name"]))
         else:
             self.validation_tree.insert("", "end", values=("Name", "✗ Missing", "Not found"))
-        
-        # Extract claim type
-        claim_type = None
-        if re.search(r"Health", text, re.IGNORECASE):
-            claim_type = "Health"
-        elif re.search(r"Auto", text, re.IGNORECASE):
-            claim_type = "Auto"
-        elif re.search(r"Life", text, re.IGNORECASE):
-            claim_type = "Life"
             
-        if claim_type:
-            claim["ClaimType"] = claim_type
-            self.validation_tree.insert("", "end", values=("Claim Type", "✓ Found", claim_type))
+        if claim["ClaimType"]:
+            self.validation_tree.insert("", "end", values=("Claim Type", "✓ Found", claim["ClaimType"]))
         else:
             self.validation_tree.insert("", "end", values=("Claim Type", "✗ Missing", "Not found"))
-        
-        # Extract claim amount
-        amount_match = re.search(r"Claim Amount\s*[:]?\s*[\$]?\s*(\d+[.,]?\d*)", text, re.IGNORECASE)
-        if amount_match:
-            amount_str = amount_match.group(1).replace(',', '').replace('.', '')
-            claim["ClaimAmount"] = int(amount_str)
+            
+        if claim["ClaimAmount"] is not None:
             self.validation_tree.insert("", "end", values=("Claim Amount", "✓ Found", f"${claim['ClaimAmount']}"))
         else:
-            # Fallback: look for any dollar amount in the text
-            fallback_match = re.search(r"\$?\s*(\d+[.,]?\d*)", text)
-            if fallback_match:
-                amount_str = fallback_match.group(1).replace(',', '').replace('.', '')
-                claim["ClaimAmount"] = int(amount_str)
-                self.validation_tree.insert("", "end", values=("Claim Amount", "✓ Found", f"${claim['ClaimAmount']}"))
-            else:
-                self.validation_tree.insert("", "end", values=("Claim Amount", "✗ Missing", "Not found"))
-        
-        # Validate the claim
-        reasons = []
-        if not claim["Name"]:
-            reasons.append("Missing Name")
-        if claim["ClaimAmount"] is None or claim["ClaimAmount"] <= 0:
-            reasons.append("Invalid ClaimAmount")
-        if not claim["ClaimType"]:
-            reasons.append("Invalid ClaimType")
-
-        if reasons:
-            claim["validation_status"] = "Invalid"
-            claim["validation_reasons"] = ", ".join(reasons)
-            self.validation_tree.insert("", "end", values=("Overall", "✗ Invalid", ", ".join(reasons)))
+            self.validation_tree.insert("", "end", values=("Claim Amount", "✗ Missing", "Not found"))
+        
+        if claim["validation_status"] == "Invalid":
+            self.validation_tree.insert("", "end", values=("Overall", "✗ Invalid", claim["validation_reasons"]))
         else:
-            claim["validation_status"] = "Valid"
             self.validation_tree.insert("", "end", values=("Overall", "✓ Valid", "All fields OK"))
         
-        # Store the claim for later processing
-        self.records.append(claim)
-        
-        # Update the results display after each form is processed
-        self.update_results_display()
-        
     def process_forms(self):
         if not self.forms:
             messagebox.showwarning("Warning", "Please upload form images first.")
             return
             
-        self.records = []
-        self.claim_id_counter = 101
-        
+        if self.runner is not None:
+            messagebox.showwarning("Warning", "Forms are already being processed.")
+            return
+            
+        # Forms already extracted and unchanged since keep their claims; records of forms
+        # that are no longer loaded are dropped
+        reused = []
+        pending = []
+        for form, claim_id in zip(self.forms, self.claim_ids):
+            if self.form_results.lookup(form, claim_id) is None:
+                pending.append((form, claim_id))
+            else:
+                reused.append(form)
+        self.form_results.retain(self.records, reused)
+        self.update_results_display()
+        self.metrics.reset()
+        
+        # Forms finished in an earlier session, even one that crashed, are taken from the
+        # job ledger instead of being processed again
+        if self.ledger is not None and pending:
+            finished = self.ledger.claims([form for form, _ in pending])
+            for form, _ in pending:
+                if form in finished:
+                    self.store_form_record(form, file_signature(form), finished[form])
+            pending = [(form, claim_id) for form, claim_id in pending if form not in finished]
+            
         # Configure progress bar
         self.progress['maximum'] = len(self.forms)
-        self.progress['value'] = 0
+        self.progress['value'] = len(self.forms) - len(pending)
         
-        # Process all forms
-        for i, form in enumerate(self.forms):
-            self.status_var.set(f"Processing form {i+1} of {len(self.forms)}")
-            self.progress['value'] = i + 1
-            self.root.update_idletasks()
-            
-            img = cv2.imread(form)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        # Checkpoint every claim as it arrives so a crash mid-batch loses nothing already validated
+        from result_sinks import checkpoint_path, open_sink
+        self.sink = open_sink(checkpoint_path())
+        for record in self.records:
+            self.sink.write(record.to_dict())
             
-            text = pytesseract.image_to_string(thresh)
+        # Process the remaining forms on the worker pool; results are collected by poll_processing()
+        if pending and self.executor is None:
+            self.executor = create_executor()
+        self.runner = FormBatchRunner(self.executor, [form for form, _ in pending],
+                                      claim_ids=[claim_id for _, claim_id in pending])
+        self.runner.pump()
+        
+        self.pause_button.configure(text="Pause", state=tk.NORMAL)
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.status_var.set(f"Processing {len(self.forms)} form(s)")
+        self.root.after(50, self.poll_processing)
+        
+    def poll_processing(self):
+        runner = self.runner
+        if runner is None:
+            return
             
-            claim = {"ClaimID": self.claim_id_counter, "Name": None, "ClaimType": None,
-                     "ClaimAmount": None, "validation_status": None, "validation_reasons": ""}
-
-            # Extract name
-            match = re.search(r"Name of Insured\s*[:]?\s*([A-Za-z ]+)", text, re.IGNORECASE)
-            if match:
-                claim["Name"] = match.group(1).strip()
-
-            # Extract claim type
-            if re.search(r"Health", text, re.IGNORECASE):
-                claim["ClaimType"] = "Health"
-            elif re.search(r"Auto", text, re.IGNORECASE):
-                claim["ClaimType"] = "Auto"
-            elif re.search(r"Life", text, re.IGNORECASE):
-                claim["ClaimType"] = "Life"
-
-            # Extract claim amount
-            amount_match = re.search(r"Claim Amount\s*[:]?\s*[\$]?\s*(\d+[.,]?\d*)", text, re.IGNORECASE)
-            if amount_match:
-                amount_str = amount_match.group(1).replace(',', '').replace('.', '')
-                claim["ClaimAmount"] = int(amount_str)
-            else:
-                # Fallback: look for any dollar amount in the text
-                fallback_match = re.search(r"\$?\s*(\d+[.,]?\d*)", text)
-                if fallback_match:
-                    amount_str = fallback_match.group(1).replace(',', '').replace('.', '')
-                    claim["ClaimAmount"] = int(amount_str)
-
-            # Validate the claim
-            reasons = []
-            if not claim["Name"]:
-                reasons.append("Missing Name")
-            if claim["ClaimAmount"] is None or claim["ClaimAmount"] <= 0:
-                reasons.append("Invalid ClaimAmount")
-            if not claim["ClaimType"]:
-                reasons.append("Invalid ClaimType")
-
-            if reasons:
+        received = 0
+        for form, claim_id, result, error in runner.drain():
+            if error is not None:
+                from claim_processing import new_claim
+                claim = new_claim(claim_id)
                 claim["validation_status"] = "Invalid"
-                claim["validation_reasons"] = ", ".join(reasons)
+                claim["validation_reasons"] = f"Processing Error: {error}"
+                # Not kept for the form, so the next run tries it again
+                self.add_record(claim)
+                if self.ledger is not None:
+                    self.ledger.record_error(form, error)
             else:
-                claim["validation_status"] = "Valid"
-
-            self.records.append(claim)
-            self.claim_id_counter += 1
+                claim, _, timings = result
+                self.metrics.merge(timings)
+                self.store_form_record(form, file_signature(form), claim)
+                if self.ledger is not None:
+                    self.ledger.record(form, claim)
+            self.metrics.form_done()
+            with self.metrics.time("sink"):
+                self.sink.write(claim)
+            received += 1
             
-            # Update the display after each form
-            self.update_results_display()
-        
-        # Display results
-        self.status_var.set(f"Processed {len(self.forms)} form(s)")
+        # Keep the pool topped up with the next forms
+        runner.pump()
         
-    def update_results_display(self):
-        # Clear previous results
-        for item in self.validation_results_tree.get_children():
-            self.validation_results_tree.delete(item)
+        if received:
+            self.progress['value'] = len(self.forms) - runner.total + runner.completed
             
-        for item in self.priority_tree.get_children():
-            self.priority_tree.delete(item)
+        if runner.finished:
+            self.finish_processing()
+            return
+            
+        if runner.paused:
+            self.status_var.set(f"Paused after {runner.completed} of {runner.total} form(s)")
+        elif runner.cancelled:
+            self.status_var.set(f"Cancelling... waiting for {len(runner.in_flight)} form(s) in progress")
+        else:
+            self.status_var.set(f"Processing form {runner.completed + 1} of {runner.total} | "
+                                f"{self.metrics.throughput.rate():.1f} forms/s")
+        self.root.after(50, self.poll_processing)
         
-        # Display validation results
-        for record in self.records:
-            tag = "valid" if record["validation_status"] == "Valid" else "invalid"
-            self.validation_results_tree.insert("", "end", values=(
-                record["ClaimID"],
-                record["Name"] or "N/A",
-                record["ClaimType"] or "N/A",
-                f"${record['ClaimAmount']}" if record["ClaimAmount"] else "N/A",
-                record["validation_status"],
-                record["validation_reasons"]
-            ), tags=(tag,))
-        
-        # Display priority ranking
-        valid_claims = [claim for claim in self.records if claim["validation_status"] == "Valid"]
-        valid_claims.sort(key=lambda x: x["ClaimAmount"], reverse=True)
-        
-        for i, claim in enumerate(valid_claims):
-            self.priority_tree.insert("", "end", values=(
-                i+1,
-                claim["ClaimID"],
-                claim["Name"],
-                claim["ClaimType"],
-                f"${claim['ClaimAmount']}"
-            ))
+    def finish_processing(self):
+        runner = self.runner
+        self.runner = None
+        self.pause_button.configure(text="Pause", state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.DISABLED)
+        
+        # Keep the batch's stage timings next to its checkpoint
+        self.metrics.dump(os.path.splitext(self.sink.path)[0] + ".metrics.json")
+        self.close_sink()
+        
+        # Display results
+        rate = f"{self.metrics.throughput.overall():.1f} forms/s"
+        if runner.cancelled:
+            self.status_var.set(f"Cancelled after {runner.completed} of {runner.total} form(s) | {rate}")
+        else:
+            reused = len(self.forms) - runner.total
+            self.status_var.set(f"Processed {runner.total} form(s)" + (f", {reused} already done" if reused else "")
+                                + f" | {rate}")
+        if self.history_scope():
+            self.refresh_history()
+            
+    def close_sink(self):
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+            
+    def toggle_pause(self):
+        if self.runner is None:
+            return
+        if self.runner.paused:
+            self.runner.resume()
+            self.pause_button.configure(text="Pause")
+        else:
+            self.runner.pause()
+            self.pause_button.configure(text="Resume")
+            
+    def cancel_processing(self):
+        if self.runner is None:
+            return
+        self.runner.cancel()
+        self.pause_button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.DISABLED)
+        
+    def on_close(self):
+        if self.runner is not None:
+            self.runner.cancel()
+        self.close_sink()
+        self.thumbnails.shutdown()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.ledger is not None:
+            self.ledger.close()
+        if self.results_db is not None:
+            self.results_db.close()
+        self.root.destroy()
+        
+    def add_record(self, record):
+        # Returns the record's row
+        record_id = self.records.append(record)
+        self.search_index.add(record_id, record)
+        self.pending_records.append(record_id)
+        
+        # Coalesce bursts of results into a single redraw once the event loop is idle
+        if not self.redraw_scheduled:
+            self.redraw_scheduled = True
+            self.root.after_idle(self.flush_results_display)
+        return record_id
+        
+    def store_form_record(self, path, signature, record):
+        # One record per form: a form that changed on disk or was renumbered replaces its
+        # old claim, and a claim that is already current (say, a form previewed while the
+        # batch was running) is kept. Returns the record's row.
+        record_id = self.form_results.row(path)
+        if record_id is None:
+            record_id = self.add_record(record)
+        elif self.form_results.lookup(path, record["ClaimID"]) is not None:
+            return record_id
+        else:
+            self.records.set(record_id, record)
+            if self.results_db is not None:
+                self.results_db.put(record)
+                self.results_db.commit()
+            # Rare, so the views are simply rebuilt
+            self.update_results_display()
+        self.form_results.put(path, signature, record["ClaimID"], record_id)
+        return record_id
+        
+    def flush_results_display(self):
+        start = time.perf_counter()
+        self.redraw_scheduled = False
+        record_ids, self.pending_records = self.pending_records, []
+        text, status = self.current_filter()
+        
+        history = self.history_scope()
+        
+        for record_id in record_ids:
+            record = self.records[record_id]
+            # New rows only appear in the list view if they match the active filter and search
+            if not history and self.search_index.matches(record_id, text, status):
+                self.insert_result_row(record)
+            if record["validation_status"] == "Valid":
+                self.insert_priority_row(record_id)
+                self.valid_count += 1
+                
+        if record_ids:
+            # The burst is saved in one transaction
+            if self.results_db is not None:
+                self.results_db.put_many(self.records[record_id] for record_id in record_ids)
+                self.results_db.commit()
+            if history and self.runner is None:
+                # A previewed form; during a batch the pages are reloaded when it finishes
+                self.refresh_history()
+            self.refresh_visible_priorities()
+            self.update_stats()
+            self.metrics.observe("ui", time.perf_counter() - start)
+            
+    def update_results_display(self):
+        # Full rebuild, used when the record list is replaced rather than appended to
+        self.pending_records = []
+        self.priority_tree.delete(*self.priority_tree.get_children())
+        self.ranking.clear()
+        self.priority_items = {}
+        self.search_index.clear()
+        self.valid_count = 0
+        
+        for record_id, record in enumerate(self.records):
+            self.search_index.add(record_id, record)
+            if record["validation_status"] == "Valid":
+                self.insert_priority_row(record_id)
+                self.valid_count += 1
+                
+        self.apply_filters()
+        if self.history_scope():
+            self.show_ranking_page(self.ranking_pager.first())
+        else:
+            self.update_pager(self.ranking_pager_controls, None)
+        self.refresh_visible_priorities()
+        self.update_stats()
+        
+    def insert_result_row(self, record, index="end"):
+        tag = "valid" if record["validation_status"] == "Valid" else "invalid"
+        self.validation_results_tree.insert("", index, values=(
+            record["ClaimID"],
+            record["Name"] or "N/A",
+            record["ClaimType"] or "N/A",
+            f"${record['ClaimAmount']}" if record["ClaimAmount"] else "N/A",
+            record["validation_status"],
+            record["validation_reasons"]
+        ), tags=(tag,))
+        
+    def insert_priority_row(self, record_id):
+        index = self.ranking.add(record_id)
+        if self.history_scope():
+            # The tree holds a page of the results database; it is rebuilt from the ranking
+            # when the scope goes back to this session
+            return
+        claim = self.records[record_id]
+        item = self.priority_tree.insert("", index, values=(
+            index + 1,
+            claim["ClaimID"],
+            claim["Name"],
+            claim["ClaimType"],
+            f"${claim['ClaimAmount']}"
+        ))
+        self.priority_items[record_id] = item
+        
+    def refresh_visible_priorities(self):
+        # Inserting a row shifts the rank of every row below it, so only the rows on
+        # screen are renumbered; the rest are renumbered when scrolled into view
+        if not self.ranking or self.history_scope():
+            return
+        first = float(self.priority_tree.yview()[0])
+        index = max(0, int(first * len(self.ranking)) - 1)
+        seen_visible = False
+        for rank in range(index + 1, len(self.ranking) + 1):
+            item = self.priority_items[self.ranking[rank - 1]]
+            if self.priority_tree.bbox(item):
+                seen_visible = True
+                self.priority_tree.set(item, "Priority", rank)
+            elif seen_visible or rank > index + 2:
+                break
+                
+    def on_priority_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        self.refresh_visible_priorities()
         
-        # Update statistics
+    def update_stats(self):
         total = len(self.records)
-        valid = len([r for r in self.records if r["validation_status"] == "Valid"])
+        valid = self.valid_count
         invalid = total - valid
         self.stats_var.set(f"Total: {total} forms | Valid: {valid} | Invalid: {invalid}")
         
-    def filter_records(self, event=None):
-        # Clear previous results
-        for item in self.validation_results_tree.get_children():
-            self.validation_results_tree.delete(item)
-            
-        # Filter records based on selection
+    def current_filter(self):
         filter_value = self.filter_var.get()
+        status = None if filter_value in ("", "All") else filter_value.capitalize()
+        return self.search_var.get(), status
         
-        if filter_value == "All":
-            filtered_records = self.records
-        else:
-            filtered_records = [r for r in self.records if r["validation_status"] == filter_value.capitalize()]
-        
-        # Display filtered results
-        for record in filtered_records:
-            tag = "valid" if record["validation_status"] == "Valid" else "invalid"
-            self.validation_results_tree.insert("", "end", values=(
-                record["ClaimID"],
-                record["Name"] or "N/A",
-                record["ClaimType"] or "N/A",
-                f"${record['ClaimAmount']}" if record["ClaimAmount"] else "N/A",
-                record["validation_status"],
-                record["validation_reasons"]
-            ), tags=(tag,))
+    def filter_records(self, event=None):
+        self.apply_filters()
             
     def search_records(self, event=None):
-        # Clear previous results
-        for item in self.validation_results_tree.get_children():
-            self.validation_results_tree.delete(item)
+        # Debounce keystrokes so only the last one in a burst runs a query
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(150, self.apply_filters)
+        
+    def apply_filters(self):
+        self.search_job = None
+        if self.render_job is not None:
+            self.root.after_cancel(self.render_job)
+            self.render_job = None
             
-        # Search records based on text
-        search_text = self.search_var.get().lower()
+        # Clear previous results
+        self.validation_results_tree.delete(*self.validation_results_tree.get_children())
+        
+        text, status = self.current_filter()
+        if self.history_scope():
+            # Paged from the database's indexes rather than searched in memory
+            db = self.results_db
+            self.result_pager = ResultPager(lambda after, limit: db.search(text, status, after=after, limit=limit),
+                                            key=lambda claim: claim["ClaimID"])
+            self.show_result_page(self.result_pager.first())
+            return
+        self.result_pager = None
+        self.update_pager(self.result_pager_controls, None)
+        record_ids = self.search_index.search(text, status)
+        self.render_rows(record_ids, 0)
+        
+    def history_scope(self):
+        return self.scope_var.get() == "All results"
+        
+    def change_scope(self, event=None):
+        if self.history_scope():
+            db = self.open_results_db()
+            if db is None:
+                messagebox.showinfo("Info", "The results database is disabled (CLAIMS_RESULTS_DB=0).")
+                self.scope_var.set("This session")
+                return
+            self.status_var.set(f"All results: {db.count()} claim(s) saved")
+        # Both tabs are rebuilt for the new scope
+        self.update_results_display()
         
-        if not search_text:
-            # If search is empty, show all records
-            filtered_records = self.records
+    def refresh_history(self):
+        # Reloads the pages on screen, e.g. once new claims have been saved
+        self.show_result_page(self.result_pager.load())
+        self.show_ranking_page(self.ranking_pager.load())
+        
+    def show_result_page(self, claims):
+        self.validation_results_tree.delete(*self.validation_results_tree.get_children())
+        for claim in claims:
+            self.insert_result_row(claim)
+        self.update_pager(self.result_pager_controls, self.result_pager)
+        
+    def show_ranking_page(self, claims):
+        self.priority_tree.delete(*self.priority_tree.get_children())
+        for rank, claim in enumerate(claims, self.ranking_pager.offset + 1):
+            self.priority_tree.insert("", "end", values=(
+                rank,
+                claim["ClaimID"],
+                claim["Name"],
+                claim["ClaimType"],
+                f"${claim['ClaimAmount']}"
+            ))
+        self.update_pager(self.ranking_pager_controls, self.ranking_pager)
+        
+    def update_pager(self, controls, pager):
+        label_var, previous_button, next_button = controls
+        if pager is None:
+            label_var.set("")
+            previous_button.configure(state=tk.DISABLED)
+            next_button.configure(state=tk.DISABLED)
+            return
+        if pager.rows:
+            label_var.set(f"Showing {pager.offset + 1}-{pager.offset + len(pager.rows)}")
         else:
-            # Filter records that match search text
-            filtered_records = []
-            for record in self.records:
-                if (search_text in str(record["ClaimID"]).lower() or
-                    search_text in (record["Name"] or "").lower() or
-                    search_text in (record["ClaimType"] or "").lower() or
-                    search_text in (record["validation_status"] or "").lower() or
-                    search_text in (record["validation_reasons"] or "").lower()):
-                    filtered_records.append(record)
-        
-        # Apply additional filter if selected
-        filter_value = self.filter_var.get()
-        if filter_value != "All":
-            filtered_records = [r for r in filtered_records if r["validation_status"] == filter_value.capitalize()]
-        
-        # Display filtered results
-        for record in filtered_records:
-            tag = "valid" if record["validation_status"] == "Valid" else "invalid"
-            self.validation_results_tree.insert("", "end", values=(
-                record["ClaimID"],
-                record["Name"] or "N/A",
-                record["ClaimType"] or "N/A",
-                f"${record['ClaimAmount']}" if record["ClaimAmount"] else "N/A",
-                record["validation_status"],
-                record["validation_reasons"]
-            ), tags=(tag,))
+            label_var.set("No saved claims")
+        previous_button.configure(state=tk.NORMAL if pager.has_previous else tk.DISABLED)
+        next_button.configure(state=tk.NORMAL if pager.has_next else tk.DISABLED)
+        
+    def turn_page(self, view, step):
+        pager = self.result_pager if view == "results" else self.ranking_pager
+        if pager is None:
+            return
+        claims = pager.next() if step > 0 else pager.previous()
+        if view == "results":
+            self.show_result_page(claims)
+        else:
+            self.show_ranking_page(claims)
+        
+    def render_rows(self, record_ids, start, chunk_size=500):
+        # Large result sets are inserted a chunk at a time so typing never waits on
+        # the whole list; rows go at fixed positions so live results still append after them
+        self.render_job = None
+        end = min(start + chunk_size, len(record_ids))
+        for position in range(start, end):
+            self.insert_result_row(self.records[record_ids[position]], position)
+        if end < len(record_ids):
+            self.render_job = self.root.after(1, self.render_rows, record_ids, end, chunk_size)
         
     def export_results(self):
         if not self.records:
             messagebox.showwarning("Warning", "No data to export. Please process forms first.")
             return
             
-        # Create DataFrames
-        df = pd.DataFrame(self.records)
-        valid_claims = df[df["validation_status"] == "Valid"].copy()
-        valid_claims = valid_claims.sort_values(by="ClaimAmount", ascending=False)
-        valid_claims["priority_score"] = range(1, len(valid_claims) + 1)
+        self.flush_results_display()
         
         # Ask for save location
         file_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("All files", "*.*")],
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"),
+                       ("Parquet files", "*.parquet"), ("SQLite databases", "*.sqlite"), ("All files", "*.*")],
             title="Save Results As"
         )
         
         if file_path:
             if file_path.endswith('.xlsx'):
+                import pandas as pd
+                from claim_processing import build_result_frames
+                df, valid_claims = build_result_frames(self.records, self.ranking)
                 with pd.ExcelWriter(file_path) as writer:
                     df.to_excel(writer, sheet_name="Validation Results", index=False)
                     valid_claims.to_excel(writer, sheet_name="Priority Ranking", index=False)
             else:
-                df.to_csv(file_path, index=False)
-                
+                # Other formats are streamed straight from the store and the live ranking,
+                # with the Priority Ranking written next to the results, or into a database
+                # as its own table
+                base, extension = os.path.splitext(file_path)
+                from result_sinks import SINK_TYPES, CsvSink, SqliteSink, write_ranking, write_ranking_table, \
+                    write_results
+                try:
+                    if extension.lower() not in SINK_TYPES:
+                        # Any other name gets the results as CSV, as it always has
+                        with CsvSink(file_path) as sink:
+                            sink.write_many(self.records)
+                    elif SINK_TYPES[extension.lower()] is SqliteSink:
+                        write_results(self.records, file_path)
+                        write_ranking_table(self.records, self.ranking, file_path)
+                    else:
+                        write_results(self.records, file_path)
+                        write_ranking(self.records, self.ranking, f"{base}_priority_ranking{extension}")
+                except (ValueError, ImportError) as e:
+                    messagebox.showerror("Error", f"Could not export results: {e}")
+                    return
+                    
             messagebox.showinfo("Success", f"Results exported successfully to {file_path}")
         
     def clear_all(self):
+        if self.runner is not None:
+            self.cancel_processing()
+            self.runner = None
+            self.pause_button.configure(text="Pause")
+        self.close_sink()
+            
         self.forms = []
-        self.records = []
-        self.claim_id_counter = 101
+        self.claim_ids = []
+        self.records.clear()
+        self.form_results.clear()
         self.current_image_index = -1
         self.current_image = None
+        self.thumbnails.clear()
         
         # Clear UI elements
         self.image_label.configure(image="", text="No image selected")
         self.text_area.delete(1.0, tk.END)
         self.search_var.set("")
         self.filter_var.set("All")
+        self.scope_var.set("This session")
+        self.result_pager = None
+        self.update_pager(self.result_pager_controls, None)
+        self.update_pager(self.ranking_pager_controls, None)
         self.stats_var.set("Total: 0 forms | Valid: 0 | Invalid: 0")
         self.progress['value'] = 0
         
@@ -569,6 +909,17 @@ class InsuranceClaimProcessor:
         for item in self.priority_tree.get_children():
             self.priority_tree.delete(item)
             
+        for job in (self.search_job, self.render_job):
+            if job is not None:
+                self.root.after_cancel(job)
+        self.search_job = None
+        self.render_job = None
+        
+        self.pending_records = []
+        self.ranking.clear()
+        self.priority_items = {}
+        self.search_index.clear()
+        self.valid_count = 0
         self.status_var.set("Ready to process forms")
         
     def next_image(self):
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import time
+
+from form_results import file_signature
+
+DEFAULT_LEDGER_PATH = os.path.join(os.path.expanduser("~"), ".cache", "insurance_claims", "jobs.sqlite")
+# A commit costs tens of microseconds in WAL mode, against tens of milliseconds of OCR
+# per form, so by default every result is committed as it arrives
+DEFAULT_COMMIT_EVERY = 1
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# One row per form (a file, or a page of a multi-page file); the claim columns hold the
+# result once the form is done
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forms (
+    form TEXT PRIMARY KEY,
+    claim_id INTEGER NOT NULL UNIQUE,
+    state TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    error TEXT,
+    Name TEXT,
+    ClaimType TEXT,
+    ClaimAmount,
+    validation_status TEXT,
+    validation_reasons TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS forms_state ON forms (state);
+"""
+
+RESULT_COLUMNS = ("Name", "ClaimType", "ClaimAmount", "validation_status", "validation_reasons")
+
+# SQLite variables per statement, well below every version's limit
+CHUNK = 500
+
+
+def form_key(form):
+    # Forms are recorded by absolute path, so the same file is one form from any working directory
+    return os.path.abspath(form)
+
+
+def _stored_amount(amount):
+    # OCR noise can exceed SQLite's 64-bit integers; such amounts are kept as text
+    if amount is None or -2 ** 63 <= amount < 2 ** 63:
+        return amount
+    return str(amount)
+
+
+class JobLedger:
+    """SQLite record of every form a batch was given and what became of it.
+
+    A form gets its claim ID the first time it is registered and keeps it in
+    every later run, whichever other forms a run includes. A finished form's
+    claim is stored with the file's size and modification time, and claims()
+    only returns it while the file is unchanged, so a resumed batch processes
+    just the forms that are pending, failed or modified. Results are
+    committed every commit_every forms and on commit() or close(); after a
+    crash any uncommitted ones are simply processed again.
+    """
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH, first_claim_id=101, commit_every=DEFAULT_COMMIT_EVERY):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.first_claim_id = first_claim_id
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.connection = sqlite3.connect(path)
+        # WAL with NORMAL sync: a commit doesn't wait for the disk, and a crash can only
+        # lose the last commits, never corrupt the ledger
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def _select(self, columns, keys):
+        # {key: row} for the given forms that are in the ledger
+        rows = {}
+        keys = list(dict.fromkeys(keys))
+        for start in range(0, len(keys), CHUNK):
+            chunk = keys[start:start + CHUNK]
+            cursor = self.connection.execute(
+                f"SELECT form, {columns} FROM forms WHERE form IN ({','.join('?' * len(chunk))})", chunk)
+            for row in cursor:
+                rows[row[0]] = row[1:]
+        return rows
+
+    def register(self, forms, first_claim_id=None):
+        # Returns the claim IDs of forms, in order; forms seen before keep theirs. New forms are
+        # numbered after every ID the ledger has given out and from at least first_claim_id
+        # (default: the ledger's), e.g. past the claims already in a results database.
+        keys = [form_key(form) for form in forms]
+        known = {key: row[0] for key, row in self._select("claim_id", keys).items()}
+        highest = self.connection.execute("SELECT MAX(claim_id) FROM forms").fetchone()[0]
+        first = max(self.first_claim_id, first_claim_id or self.first_claim_id)
+        next_id = first if highest is None else max(first, highest + 1)
+
+        now = time.time()
+        new = []
+        for key in keys:
+            if key not in known:
+                known[key] = next_id
+                new.append((key, next_id, PENDING, now))
+                next_id += 1
+        if new:
+            self.connection.executemany("INSERT INTO forms (form, claim_id, state, updated) VALUES (?, ?, ?, ?)", new)
+        self.commit()
+        return [known[key] for key in keys]
+
+    def record(self, form, claim):
+        signature = file_signature(form) or (None, None)
+        values = [claim[column] for column in RESULT_COLUMNS]
+        values[2] = _stored_amount(values[2])
+        self.connection.execute(
+            "UPDATE forms SET state = ?, error = NULL, size = ?, mtime_ns = ?, "
+            f"{', '.join(column + ' = ?' for column in RESULT_COLUMNS)}, updated = ? WHERE form = ?",
+            (DONE, *signature, *values, time.time(), form_key(form)))
+        self._written()
+
+    def record_error(self, form, error):
+        # Clearing the signature keeps claims() from returning an earlier result
+        self.connection.execute("UPDATE forms SET state = ?, error = ?, size = NULL, mtime_ns = NULL, updated = ? "
+                                "WHERE form = ?", (FAILED, str(error), time.time(), form_key(form)))
+        self._written()
+
+    def _written(self):
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+
+    def claims(self, forms):
+        # {form: claim} for the forms whose stored claim is still current, keyed as given
+        keys = {form: form_key(form) for form in forms}
+        rows = self._select(f"claim_id, size, mtime_ns, {', '.join(RESULT_COLUMNS)}", keys.values())
+        claims = {}
+        for form, key in keys.items():
+            row = rows.get(key)
+            if row is None or row[1] is None:
+                continue
+            if file_signature(form) != (row[1], row[2]):
+                continue
+            claim = {"ClaimID": row[0]}
+            claim.update(zip(RESULT_COLUMNS, row[3:]))
+            if isinstance(claim["ClaimAmount"], str):
+                claim["ClaimAmount"] = int(claim["ClaimAmount"])
+            claims[form] = claim
+        return claims
+
+    def counts(self):
+        # {state: number of forms}
+        return dict(self.connection.execute("SELECT state, COUNT(*) FROM forms GROUP BY state"))
+
+    def commit(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+
+_ledger = None
+_ledger_configured = False
+
+
+def configure_ledger(path=None, enabled=True):
+    global _ledger, _ledger_configured
+    if _ledger is not None:
+        _ledger.close()
+    _ledger_configured = True
+    _ledger = JobLedger(path or DEFAULT_LEDGER_PATH) if enabled else None
+    return _ledger
+
+
+def get_ledger():
+    # The GUI's ledger: CLAIMS_LEDGER names the file, or disables it with 0
+    if not _ledger_configured:
+        path = os.environ.get("CLAIMS_LEDGER")
+        configure_ledger(path if path != "0" else None, enabled=path != "0")
+    return _ledger
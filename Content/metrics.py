@@ -0,0 +1,214 @@
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Histogram buckets grow by 10% from 1 microsecond, so any quantile is within
+# about 5% of the true value while a histogram stays a few hundred ints
+MIN_SECONDS = 1e-6
+GROWTH = 1.1
+QUANTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+
+# Per-form stages timed in claim_processing (in the worker processes) and
+# in the batch/GUI loops; any other name can be recorded as well
+STAGES = ("read", "cache", "decode", "preprocess", "ocr", "extract", "validate", "form", "sink", "ui")
+
+DEFAULT_RATE_WINDOW = 10.0
+
+
+class LatencyHistogram:
+    """Count, total and log-bucketed distribution of one stage's latencies."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = int(math.log(seconds / MIN_SECONDS, GROWTH)) if seconds > MIN_SECONDS else 0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        # Geometric middle of the bucket holding the q-th observation, capped at the largest seen
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(MIN_SECONDS * GROWTH ** (index + 0.5), self.max)
+        return self.max
+
+    def summary(self):
+        summary = {"count": self.count, "total_s": round(self.total, 6),
+                   "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0}
+        for name, q in QUANTILES:
+            summary[f"{name}_ms"] = round(self.quantile(q) * 1000, 3)
+        summary["max_ms"] = round(self.max * 1000, 3)
+        return summary
+
+
+class ThroughputMeter:
+    """Completed items per second, over the last window seconds and overall."""
+
+    def __init__(self, window=DEFAULT_RATE_WINDOW):
+        self.window = window
+        self.marks = deque()
+        self.started = None
+        self.completed = 0
+
+    def start(self):
+        self.started = time.monotonic()
+        self.marks.clear()
+        self.completed = 0
+
+    def mark(self, count=1):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        self.completed += count
+        self.marks.append((now, count))
+        while self.marks and self.marks[0][0] < now - self.window:
+            self.marks.popleft()
+
+    def rate(self):
+        if self.started is None:
+            return 0.0
+        now = time.monotonic()
+        while self.marks and self.marks[0][0] < now - self.window:
+            self.marks.popleft()
+        span = min(self.window, now - self.started)
+        return sum(count for _, count in self.marks) / span if span > 0 else 0.0
+
+    def overall(self):
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+
+class Metrics:
+    """Latency histograms per stage plus a forms-per-second meter.
+
+    Stages are timed with time() or recorded with observe(). Worker
+    processes can't share a Metrics object, so process_form() collects its
+    own timings with capture() and returns them, and the parent adds them
+    with merge(). Safe to use from several threads.
+    """
+
+    def __init__(self, rate_window=DEFAULT_RATE_WINDOW):
+        self.histograms = {}
+        self.throughput = ThroughputMeter(rate_window)
+        self.captures = []
+        self.lock = threading.Lock()
+        self.created = time.monotonic()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.observe(seconds)
+            for timings in self.captures:
+                timings[stage] = timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    @contextmanager
+    def capture(self):
+        # Yields a dict that collects {stage: seconds} for everything observed inside the block
+        timings = {}
+        with self.lock:
+            self.captures.append(timings)
+        try:
+            yield timings
+        finally:
+            with self.lock:
+                self.captures.remove(timings)
+
+    def merge(self, timings):
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+
+    def form_done(self, count=1):
+        self.throughput.mark(count)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+        self.throughput.start()
+
+    def snapshot(self):
+        with self.lock:
+            stages = {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+        ordered = {stage: stages.pop(stage) for stage in STAGES if stage in stages}
+        ordered.update(sorted(stages.items()))
+        return {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "uptime_s": round(time.monotonic() - self.created, 3),
+            "throughput": {
+                "completed": self.throughput.completed,
+                "forms_per_s": round(self.throughput.rate(), 3),
+                "overall_forms_per_s": round(self.throughput.overall(), 3),
+            },
+            "stages": ordered,
+        }
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=1)
+
+    def format_table(self):
+        lines = [f"{'stage':<12}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for stage, s in self.snapshot()["stages"].items():
+            lines.append(f"{stage:<12}{s['count']:>8}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}"
+                         f"{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+        return "\n".join(lines)
+
+
+def serve_metrics(metrics, port, host="127.0.0.1"):
+    """Serve metrics.snapshot() as JSON on http://host:port/ from a daemon thread.
+
+    Returns the server; call shutdown() on it when the batch is done.
+    """
+    # Imported here: http.server is slow to load and only batch runs serve metrics
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(metrics.snapshot(), indent=1).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_metrics = None
+
+
+def get_metrics():
+    # One registry per process
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import tempfile
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "insurance_claims", "ocr")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class OcrCache:
+    """Content-addressed on-disk cache of OCR text with size-bounded LRU eviction.
+
+    Entries are plain text files named by a hash of the image bytes plus the
+    preprocessing/OCR settings. A hit refreshes the file's mtime, so the oldest
+    mtimes are the least recently used entries and are evicted first.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self.total_bytes = self._scan_size()
+
+    @staticmethod
+    def key(image_bytes, settings):
+        digest = hashlib.sha256(image_bytes)
+        digest.update(b"\0")
+        digest.update(settings.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        # Two-level fan-out keeps directories small for large caches
+        return os.path.join(self.directory, key[:2], key + ".txt")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def put(self, key, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename so readers in other processes never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        try:
+            # An entry being replaced no longer counts towards the total
+            old_size = os.path.getsize(path)
+        except FileNotFoundError:
+            old_size = 0
+        os.replace(tmp_path, path)
+
+        self.total_bytes += os.path.getsize(path) - old_size
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".txt"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, entry.path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        # Several processes may share the directory, so rescan instead of trusting our own total
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.total_bytes = total
+
+    def clear(self):
+        for _, _, path in list(self._entries()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.total_bytes = 0
@@ -0,0 +1,236 @@
+import os
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Where the original Windows setup installed tesseract; used when it exists and
+# TESSERACT_CMD isn't set. Anywhere else tesseract is looked up on PATH.
+WINDOWS_TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+
+def configure_tesseract_cmd(cmd=None):
+    cmd = cmd or os.environ.get("TESSERACT_CMD")
+    if not cmd and os.name == "nt" and os.path.exists(WINDOWS_TESSERACT_CMD):
+        cmd = WINDOWS_TESSERACT_CMD
+    if cmd:
+        pytesseract.pytesseract.tesseract_cmd = cmd
+    return pytesseract.pytesseract.tesseract_cmd
+
+
+configure_tesseract_cmd()
+
+
+def tesseract_config(psm=None, whitelist=None):
+    # Command-line options for the tesseract executable; psm None keeps tesseract's default (3)
+    config = f"--psm {psm}" if psm is not None else ""
+    if whitelist:
+        config += f" -c tessedit_char_whitelist={whitelist}"
+    return config.strip()
+
+
+class OcrEngine:
+    """Interface every OCR engine implements.
+
+    text() returns the text of a grayscale image; psm and whitelist are
+    tesseract's page segmentation mode and character whitelist, which
+    engines that aren't tesseract may ignore. warm_up() does any slow
+    setup, such as loading a model, ahead of the first image. Engines with
+    zones = False are only given whole pages, never template field zones.
+    """
+
+    name = None
+    zones = True
+
+    def text(self, img, psm=None, whitelist=None):
+        raise NotImplementedError
+
+    def warm_up(self):
+        pass
+
+
+class PytesseractEngine(OcrEngine):
+    """Runs the tesseract executable once per image.
+
+    Every call writes the image to a temporary file, starts tesseract, which
+    loads the language model again, and reads its output back. That start-up
+    cost is paid per zone too, which makes zone OCR slower than one full page
+    (see the zone_ocr benchmark), so this engine only gets whole pages.
+    """
+
+    name = "pytesseract"
+    zones = False
+
+    def text(self, img, psm=None, whitelist=None):
+        return pytesseract.image_to_string(img, config=tesseract_config(psm, whitelist))
+
+
+class TesserocrEngine(OcrEngine):
+    """Calls libtesseract in-process through tesserocr.
+
+    Each thread keeps its own tesseract API (they aren't thread-safe), so
+    the language model is loaded once per thread and reused for every
+    image after that. Images are handed over as raw pixel buffers, with no
+    temporary files or subprocesses.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, tessdata=None, lang="eng"):
+        if tesserocr is None:
+            raise ImportError("The tesserocr engine requires tesserocr (pip install tesserocr)")
+        self.tessdata = tessdata or os.environ.get("TESSDATA_PREFIX")
+        self.lang = lang
+        self.local = threading.local()
+
+    def api(self):
+        api = getattr(self.local, "api", None)
+        if api is None:
+            options = {"lang": self.lang}
+            if self.tessdata:
+                options["path"] = self.tessdata
+            api = self.local.api = tesserocr.PyTessBaseAPI(**options)
+        return api
+
+    def text(self, img, psm=None, whitelist=None):
+        api = self.api()
+        api.SetPageSegMode(tesserocr.PSM.AUTO if psm is None else psm)
+        api.SetVariable("tessedit_char_whitelist", whitelist or "")
+        img = np.ascontiguousarray(img)
+        height, width = img.shape[:2]
+        channels = 1 if img.ndim == 2 else img.shape[2]
+        api.SetImageBytes(img.tobytes(), width, height, channels, width * channels)
+        return api.GetUTF8Text()
+
+    def warm_up(self):
+        # Load the model for the calling thread before the first form arrives
+        self.api()
+
+
+def synthetic_form_text(seed):
+    # A plausible page of OCR output for one claim form, mostly valid
+    rng = random.Random(seed)
+    name = rng.choice(["John Doe", "Mary Smith", "Jane Roe", "Alex Brown", "Sam Green"])
+    lines = [
+        f"{rng.choice(['HEALTH', 'AUTO', 'LIFE'])} INSURANCE CLAIM FORM",
+        "Policy Number: " + str(rng.randint(100000, 999999)),
+        f"Claim Amount: ${rng.randint(1, 99999) if rng.random() < 0.95 else 0}",
+        "Signature ______________________",
+    ]
+    if rng.random() < 0.9:
+        # A blank name would let the Name pattern run on into the next line, so
+        # forms without one leave out the label as well
+        lines.insert(2, f"Name of Insured:\n{name}")
+    return "\n".join(lines) + "\n"
+
+
+def load_recorded_texts(path):
+    # A directory of .txt files, one page each in name order, or a single file whose
+    # pages are separated by form feeds as tesseract writes them
+    if os.path.isdir(path):
+        texts = []
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(".txt"):
+                with open(os.path.join(path, name), "r", encoding="utf-8") as f:
+                    texts.append(f.read())
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            texts = f.read().split("\f")
+    texts = [text for text in texts if text.strip()]
+    if not texts:
+        raise ValueError(f"No recorded OCR text found in {path}")
+    return texts
+
+
+class FakeEngine(OcrEngine):
+    """Stands in for tesseract when measuring the rest of the pipeline.
+
+    Each image gets a page of text chosen by a checksum of its pixels, so a
+    given form always reads the same in every run and every process: one of
+    the recorded texts if any are given, otherwise synthetic_form_text().
+    Each call sleeps for latency seconds to model OCR time. Configured with
+    CLAIMS_FAKE_OCR_TEXTS (file or directory) and CLAIMS_FAKE_OCR_LATENCY_MS.
+    """
+
+    name = "fake"
+    zones = False
+
+    def __init__(self, texts=None, latency=None):
+        if texts is None:
+            texts = os.environ.get("CLAIMS_FAKE_OCR_TEXTS")
+        if isinstance(texts, str):
+            texts = load_recorded_texts(texts)
+        if latency is None:
+            latency = float(os.environ.get("CLAIMS_FAKE_OCR_LATENCY_MS", "0")) / 1000
+        self.texts = list(texts) if texts else None
+        self.latency = latency
+
+    def text(self, img, psm=None, whitelist=None):
+        start = time.perf_counter()
+        key = zlib.crc32(np.ascontiguousarray(img))
+        text = self.texts[key % len(self.texts)] if self.texts else synthetic_form_text(key)
+        remaining = self.latency - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        return text
+
+
+ENGINES = {
+    "pytesseract": PytesseractEngine,
+    "tesserocr": TesserocrEngine,
+    "fake": FakeEngine,
+}
+
+_engine = None
+
+
+def configure_engine(name=None):
+    """Select the OCR engine: "tesserocr", "pytesseract", "fake" or "auto".
+
+    auto (the default) uses tesserocr when it is installed and can load
+    its language model, and falls back to the pytesseract path otherwise.
+    tesserocr is loaded here rather than at the first form, so a missing
+    model fails (or falls back) before any worker process starts. See
+    FakeEngine for running the pipeline without tesseract.
+    """
+    global _engine
+    name = name or "auto"
+    if name == "auto":
+        try:
+            _engine = loaded_tesserocr()
+        except (ImportError, RuntimeError):
+            _engine = PytesseractEngine()
+        return _engine
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine {name!r}; use one of auto, {', '.join(ENGINES)}")
+    if name == "tesserocr":
+        try:
+            _engine = loaded_tesserocr()
+        except RuntimeError as e:
+            raise OSError(f"tesserocr can't load its language model ({e}); "
+                          f"set TESSDATA_PREFIX to the tessdata directory") from e
+        return _engine
+    _engine = ENGINES[name]()
+    return _engine
+
+
+def loaded_tesserocr():
+    # A tesserocr engine with its model loaded; RuntimeError when tesseract can't find it
+    engine = TesserocrEngine()
+    engine.warm_up()
+    return engine
+
+
+def get_engine():
+    # One engine per process, chosen by CLAIMS_OCR_ENGINE
+    if _engine is None:
+        configure_engine(os.environ.get("CLAIMS_OCR_ENGINE"))
+    return _engine
@@ -0,0 +1,178 @@
+from bisect import bisect_left, bisect_right
+
+
+def priority_key(claim):
+    # Highest amount first; ClaimID keeps ties in processing order
+    return (-claim["ClaimAmount"], claim["ClaimID"])
+
+
+class PriorityRanking:
+    """Valid claims kept in priority order as they arrive.
+
+    Claims live in sorted buckets of bounded size with a Fenwick tree over the
+    bucket lengths, so insert, remove, rank lookup and positional access are
+    O(log n) plus a small bucket-local shift, and the ranking never needs a
+    full re-sort. Items are claim dicts by default; pass key to rank other
+    handles such as ClaimRecordStore rows.
+    """
+
+    BUCKET_SIZE = 512
+
+    def __init__(self, claims=(), key=priority_key):
+        self.key = key
+        self.clear()
+        for claim in claims:
+            self.add(claim)
+
+    def clear(self):
+        self._keys = []
+        self._claims = []
+        self._maxes = []
+        self._tree = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for bucket in self._claims:
+            yield from bucket
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("ranking index out of range")
+        b, i = self._locate(index)
+        return self._claims[b][i]
+
+    def add(self, claim):
+        # Returns the 0-based rank the claim was inserted at
+        key = self.key(claim)
+        if not self._keys:
+            self._keys.append([key])
+            self._claims.append([claim])
+            self._maxes.append(key)
+            self._len = 1
+            self._rebuild_tree()
+            return 0
+
+        b = bisect_left(self._maxes, key)
+        if b == len(self._maxes):
+            b -= 1
+        keys = self._keys[b]
+        i = bisect_right(keys, key)
+        keys.insert(i, key)
+        self._claims[b].insert(i, claim)
+        self._maxes[b] = keys[-1]
+        self._len += 1
+        rank = self._prefix(b) + i
+
+        if len(keys) > 2 * self.BUCKET_SIZE:
+            self._split(b)
+        else:
+            self._update(b, 1)
+        return rank
+
+    def remove(self, claim):
+        key = self.key(claim)
+        b = bisect_left(self._maxes, key)
+        while b < len(self._keys):
+            keys = self._keys[b]
+            i = bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key:
+                if self._same(self._claims[b][i], claim):
+                    rank = self._prefix(b) + i
+                    del keys[i]
+                    del self._claims[b][i]
+                    self._len -= 1
+                    if keys:
+                        self._maxes[b] = keys[-1]
+                        self._update(b, -1)
+                    else:
+                        del self._keys[b], self._claims[b], self._maxes[b]
+                        self._rebuild_tree()
+                    return rank
+                i += 1
+            if i < len(keys):
+                break
+            b += 1
+        raise ValueError("claim is not in the ranking")
+
+    def rank(self, claim):
+        key = self.key(claim)
+        b = bisect_left(self._maxes, key)
+        while b < len(self._keys):
+            keys = self._keys[b]
+            i = bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key:
+                if self._same(self._claims[b][i], claim):
+                    return self._prefix(b) + i
+                i += 1
+            if i < len(keys):
+                break
+            b += 1
+        raise ValueError("claim is not in the ranking")
+
+    @staticmethod
+    def _same(item, claim):
+        # Identity for claim dicts (equal dicts may be distinct claims), equality for row numbers
+        return item is claim or (isinstance(claim, int) and item == claim)
+
+    def top(self, k):
+        result = []
+        for bucket in self._claims:
+            if len(result) >= k:
+                break
+            result.extend(bucket[:k - len(result)])
+        return result
+
+    def _split(self, b):
+        half = len(self._keys[b]) // 2
+        self._keys.insert(b + 1, self._keys[b][half:])
+        self._claims.insert(b + 1, self._claims[b][half:])
+        del self._keys[b][half:]
+        del self._claims[b][half:]
+        self._maxes[b] = self._keys[b][-1]
+        self._maxes.insert(b + 1, self._keys[b + 1][-1])
+        self._rebuild_tree()
+
+    # Fenwick tree over bucket lengths for rank <-> position lookups
+
+    def _rebuild_tree(self):
+        n = len(self._keys)
+        tree = [0] + [len(bucket) for bucket in self._keys]
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _update(self, b, delta):
+        tree = self._tree
+        i = b + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, b):
+        # Number of claims in buckets before b
+        tree = self._tree
+        total = 0
+        while b > 0:
+            total += tree[b]
+            b -= b & -b
+        return total
+
+    def _locate(self, index):
+        # Bucket and offset of the claim at a 0-based rank
+        tree = self._tree
+        pos = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= index:
+                index -= tree[nxt]
+                pos = nxt
+            step >>= 1
+        return pos, index
@@ -0,0 +1,201 @@
+import sys
+from array import array
+
+CLAIM_COLUMNS = ["ClaimID", "Name", "ClaimType", "ClaimAmount", "validation_status", "validation_reasons"]
+
+# ClaimAmount is stored as int64, so a missing amount needs a sentinel; the
+# rare OCR amount too large for int64 is kept in a side table instead
+MISSING_AMOUNT = -2 ** 63
+OVERFLOW_AMOUNT = 2 ** 63 - 1
+
+
+class Categories:
+    # Small value <-> code table for low-cardinality string columns; code -1 is None
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return None if code < 0 else self.values[code]
+
+
+class ClaimRecord:
+    """Read-only dict-style view of one row of a ClaimRecordStore."""
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, field):
+        return self.store.get(self.row, field)
+
+    def get(self, field, default=None):
+        try:
+            return self.store.get(self.row, field)
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(CLAIM_COLUMNS)
+
+    def to_dict(self):
+        return {field: self.store.get(self.row, field) for field in CLAIM_COLUMNS}
+
+    def __repr__(self):
+        return f"ClaimRecord({self.to_dict()!r})"
+
+
+class ClaimRecordStore:
+    """Column-oriented storage for validated claims.
+
+    Numbers live in typed arrays and ClaimType, status and reasons (which only
+    take a handful of distinct values) are stored as small integer codes,
+    so a claim costs a few dozen bytes instead of a dict plus its keys and
+    boxed values. Rows are addressed by position; indexing returns a
+    ClaimRecord view and to_dataframe() builds columns without per-row dicts.
+    """
+
+    def __init__(self, claims=()):
+        self.clear()
+        for claim in claims:
+            self.append(claim)
+
+    def clear(self):
+        self.claim_ids = array("q")
+        self.amounts = array("q")
+        self.names = []
+        # 16-bit codes: configurable field specs can yield many more claim types than the defaults
+        self.claim_types = array("h")
+        self.statuses = array("h")
+        self.reasons = array("i")
+        self.claim_type_categories = Categories()
+        self.status_categories = Categories()
+        self.reason_categories = Categories()
+        self.large_amounts = {}
+
+    def __len__(self):
+        return len(self.claim_ids)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("record index out of range")
+        return ClaimRecord(self, row)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield ClaimRecord(self, row)
+
+    def _encode_amount(self, row, amount):
+        if amount is None:
+            return MISSING_AMOUNT
+        if not MISSING_AMOUNT < amount < OVERFLOW_AMOUNT:
+            self.large_amounts[row] = amount
+            return OVERFLOW_AMOUNT
+        self.large_amounts.pop(row, None)
+        return amount
+
+    def append(self, claim):
+        # Returns the row the claim was stored at
+        row = len(self.claim_ids)
+        self.claim_ids.append(claim["ClaimID"])
+        self.amounts.append(self._encode_amount(row, claim["ClaimAmount"]))
+        self.names.append(claim["Name"])
+        self.claim_types.append(self.claim_type_categories.encode(claim["ClaimType"]))
+        self.statuses.append(self.status_categories.encode(claim["validation_status"]))
+        self.reasons.append(self.reason_categories.encode(claim["validation_reasons"]))
+        return row
+
+    def set(self, row, claim):
+        self.claim_ids[row] = claim["ClaimID"]
+        self.amounts[row] = self._encode_amount(row, claim["ClaimAmount"])
+        self.names[row] = claim["Name"]
+        self.claim_types[row] = self.claim_type_categories.encode(claim["ClaimType"])
+        self.statuses[row] = self.status_categories.encode(claim["validation_status"])
+        self.reasons[row] = self.reason_categories.encode(claim["validation_reasons"])
+
+    def get(self, row, field):
+        if field == "ClaimID":
+            return self.claim_ids[row]
+        if field == "Name":
+            return self.names[row]
+        if field == "ClaimType":
+            return self.claim_type_categories.decode(self.claim_types[row])
+        if field == "ClaimAmount":
+            amount = self.amounts[row]
+            if amount == MISSING_AMOUNT:
+                return None
+            if amount == OVERFLOW_AMOUNT:
+                return self.large_amounts.get(row, amount)
+            return amount
+        if field == "validation_status":
+            return self.status_categories.decode(self.statuses[row])
+        if field == "validation_reasons":
+            return self.reason_categories.decode(self.reasons[row])
+        raise KeyError(field)
+
+    def is_valid(self, row):
+        return self.status_categories.decode(self.statuses[row]) == "Valid"
+
+    def priority_key(self, row):
+        # Same ordering as priority_ranking.priority_key, read straight from the columns
+        amount = self.amounts[row]
+        if amount == OVERFLOW_AMOUNT:
+            amount = self.large_amounts.get(row, amount)
+        return (-amount, self.claim_ids[row])
+
+    def to_dataframe(self, rows=None):
+        # numpy and pandas are only imported here, so the GUI can open without them
+        import numpy as np
+        import pandas as pd
+
+        index = None if rows is None else np.asarray(rows, dtype=np.int64)
+
+        def column(values, dtype):
+            data = np.frombuffer(values, dtype=dtype) if len(values) else np.empty(0, dtype=dtype)
+            return data.copy() if index is None else data[index]
+
+        def categorical(codes, dtype, categories):
+            return pd.Categorical.from_codes(column(codes, dtype), categories=pd.Index(categories.values, dtype=object))
+
+        amounts = column(self.amounts, np.int64)
+        claim_amounts = pd.arrays.IntegerArray(amounts, amounts == MISSING_AMOUNT)
+        # Amounts too large for int64 hold a sentinel; the real ones come from the side
+        # table, in an object column as they don't fit any numeric dtype
+        overflow = np.flatnonzero(amounts == OVERFLOW_AMOUNT)
+        large = [(position, self.large_amounts[row]) for position, row in
+                 zip(overflow, overflow if index is None else index[overflow]) if row in self.large_amounts]
+        if large:
+            claim_amounts = amounts.astype(object)
+            claim_amounts[amounts == MISSING_AMOUNT] = None
+            for position, amount in large:
+                claim_amounts[position] = amount
+        names = self.names if index is None else [self.names[row] for row in index]
+        return pd.DataFrame({
+            "ClaimID": column(self.claim_ids, np.int64),
+            "Name": pd.array(names, dtype=object),
+            "ClaimType": categorical(self.claim_types, np.int16, self.claim_type_categories),
+            "ClaimAmount": claim_amounts,
+            "validation_status": categorical(self.statuses, np.int16, self.status_categories),
+            "validation_reasons": categorical(self.reasons, np.int32, self.reason_categories),
+        }, columns=CLAIM_COLUMNS)
+
+    def memory_usage(self):
+        # Bytes held by the columns, including the name strings themselves
+        total = sum(sys.getsizeof(column) for column in
+                    (self.claim_ids, self.amounts, self.names, self.claim_types, self.statuses, self.reasons))
+        total += sum(sys.getsizeof(name) for name in self.names if name is not None)
+        return total
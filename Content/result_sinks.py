@@ -0,0 +1,274 @@
+import csv
+import json
+import os
+from datetime import datetime
+
+from priority_ranking import PriorityRanking
+from record_store import CLAIM_COLUMNS, ClaimRecordStore
+from results_db import ClaimResultsDB
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+RANKING_COLUMNS = CLAIM_COLUMNS + ["priority_score"]
+INTEGER_COLUMNS = ("ClaimID", "ClaimAmount", "priority_score")
+OPTIONAL_TEXT_COLUMNS = ("Name", "ClaimType", "validation_status")
+
+DEFAULT_FLUSH_EVERY = 100
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "insurance_claims", "results")
+# Checkpoints (and their .metrics.json) kept in the checkpoint directory, newest first
+DEFAULT_KEEP_CHECKPOINTS = 10
+
+
+class ResultSink:
+    """Append-only writer for claim results.
+
+    Claims are buffered and written every flush_every claims (and on close),
+    and each flush pushes the data to the OS, so an interrupted batch keeps
+    everything up to its last flush. Works as a context manager.
+    """
+
+    def __init__(self, path, columns=CLAIM_COLUMNS, flush_every=DEFAULT_FLUSH_EVERY, append=False):
+        self.path = path
+        self.columns = list(columns)
+        self.flush_every = flush_every
+        self.append = append
+        self.buffer = []
+        self.written = 0
+        self.closed = False
+
+    def write(self, claim):
+        # claim is a dict or a ClaimRecord
+        self.buffer.append(tuple(claim[column] for column in self.columns))
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def write_many(self, claims):
+        for claim in claims:
+            self.write(claim)
+
+    def flush(self):
+        if self.buffer:
+            self._write_rows(self.buffer)
+            self.written += len(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            self._close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write_rows(self, rows):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class CsvSink(ResultSink):
+    def __init__(self, path, columns=CLAIM_COLUMNS, flush_every=DEFAULT_FLUSH_EVERY, append=False):
+        super().__init__(path, columns, flush_every, append)
+        new_file = not (append and os.path.exists(path) and os.path.getsize(path))
+        self.file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file, lineterminator="\n")
+        if new_file:
+            self.writer.writerow(self.columns)
+
+    def _write_rows(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def _close(self):
+        self.file.close()
+
+
+class JsonLinesSink(ResultSink):
+    def __init__(self, path, columns=CLAIM_COLUMNS, flush_every=DEFAULT_FLUSH_EVERY, append=False):
+        super().__init__(path, columns, flush_every, append)
+        self.file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def _write_rows(self, rows):
+        self.file.write("".join(json.dumps(dict(zip(self.columns, row))) + "\n" for row in rows))
+        self.file.flush()
+
+    def _close(self):
+        self.file.close()
+
+
+class ParquetSink(ResultSink):
+    # Each flush becomes one row group. The file is only readable once closed,
+    # so use CSV or JSON Lines for checkpoints that must survive a crash.
+    def __init__(self, path, columns=CLAIM_COLUMNS, flush_every=1000, append=False):
+        if pa is None:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        if append:
+            raise ValueError("Parquet files cannot be appended to")
+        super().__init__(path, columns, flush_every, append)
+        self.schema = pa.schema([(column, pa.int64() if column in INTEGER_COLUMNS else pa.string())
+                                 for column in self.columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def _write_rows(self, rows):
+        arrays = []
+        for index, field in enumerate(self.schema):
+            values = [row[index] for row in rows]
+            if pa.types.is_integer(field.type):
+                # Amounts beyond int64 (OCR noise) can't be represented and are written as null
+                values = [v if v is None or -2 ** 63 < v < 2 ** 63 else None for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def _close(self):
+        self.writer.close()
+
+
+class SqliteSink(ResultSink):
+    # Claims are saved into a ClaimResultsDB, replacing any stored claim with the same ID,
+    # so the database keeps the results of every run whether or not append is set
+    def __init__(self, path, columns=CLAIM_COLUMNS, flush_every=DEFAULT_FLUSH_EVERY, append=False):
+        if list(columns) != CLAIM_COLUMNS:
+            raise ValueError("A results database holds claims only; its priority ranking is a query "
+                             "(claims_cli query --ranking)")
+        super().__init__(path, columns, flush_every, append)
+        self.db = ClaimResultsDB(path)
+
+    def _write_rows(self, rows):
+        self.db.put_many(dict(zip(self.columns, row)) for row in rows)
+        self.db.commit()
+
+    def _close(self):
+        self.db.close()
+
+
+SINK_TYPES = {
+    ".csv": CsvSink,
+    ".jsonl": JsonLinesSink,
+    ".parquet": ParquetSink,
+    ".sqlite": SqliteSink,
+    ".db": SqliteSink,
+}
+
+
+def sink_type(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SINK_TYPES:
+        raise ValueError(f"Unsupported results format {extension!r}; use one of {', '.join(SINK_TYPES)}")
+    return SINK_TYPES[extension]
+
+
+def open_sink(path, columns=CLAIM_COLUMNS, **kwargs):
+    # The format is picked from the file extension
+    return sink_type(path)(path, columns, **kwargs)
+
+
+def checkpoint_path(directory=DEFAULT_CHECKPOINT_DIR, prefix="batch", keep=DEFAULT_KEEP_CHECKPOINTS):
+    # A new checkpoint file; earlier ones beyond the keep - 1 most recent are deleted
+    os.makedirs(directory, exist_ok=True)
+    prune_checkpoints(directory, prefix, keep - 1)
+    return os.path.join(directory, f"{prefix}-{datetime.now():%Y%m%d-%H%M%S}.jsonl")
+
+
+def prune_checkpoints(directory, prefix="batch", keep=DEFAULT_KEEP_CHECKPOINTS):
+    # Names end in a timestamp, so name order is age order
+    checkpoints = sorted(name for name in os.listdir(directory)
+                         if name.startswith(prefix + "-") and name.endswith(".jsonl"))
+    for name in checkpoints[:max(0, len(checkpoints) - keep)]:
+        base = os.path.join(directory, os.path.splitext(name)[0])
+        for path in (base + ".jsonl", base + ".metrics.json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _typed(claim):
+    for column in INTEGER_COLUMNS:
+        value = claim.get(column)
+        if isinstance(value, str):
+            claim[column] = int(value) if value else None
+    for column in OPTIONAL_TEXT_COLUMNS:
+        if claim.get(column) == "":
+            claim[column] = None
+    if claim.get("validation_reasons") is None:
+        claim["validation_reasons"] = ""
+    return claim
+
+
+def read_sink(path):
+    """Yield the claims written to a sink file one at a time.
+
+    A truncated last row, left by a batch that died mid-write, is skipped:
+    every complete row ends with a newline.
+    """
+    sink_type(path)  # rejects unsupported formats
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        if pq is None:
+            raise ImportError("Reading Parquet results requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from (_typed(claim) for claim in batch.to_pylist())
+    elif SINK_TYPES[extension] is SqliteSink:
+        db = ClaimResultsDB(path)
+        try:
+            yield from db
+        finally:
+            db.close()
+    elif extension == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.endswith("\n"):
+                    yield _typed(json.loads(line))
+    else:
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            for claim in csv.DictReader(line for line in f if line.endswith("\n")):
+                yield _typed(claim)
+
+
+def write_results(records, path, **kwargs):
+    # records is any iterable of claims, e.g. a ClaimRecordStore
+    with open_sink(path, **kwargs) as sink:
+        sink.write_many(records)
+
+
+def write_ranking(records, ranking, path, **kwargs):
+    # ranking holds rows of records in priority order; priority_score is the 1-based rank
+    with open_sink(path, RANKING_COLUMNS, **kwargs) as sink:
+        for score, row in enumerate(ranking, 1):
+            claim = records[row].to_dict()
+            claim["priority_score"] = score
+            sink.write(claim)
+
+
+def write_ranking_table(records, ranking, path):
+    # The Priority Ranking as the priority_ranking table of a results database
+    db = ClaimResultsDB(path)
+    try:
+        db.replace_ranking(records[row].to_dict() for row in ranking)
+    finally:
+        db.close()
+
+
+def finalize_ranking(results_path, ranking_path, **kwargs):
+    """Build the Priority Ranking output from a results sink file.
+
+    The results are streamed back one claim at a time and only valid claims
+    are kept, in a compact ClaimRecordStore, so the full result set is never
+    loaded into a DataFrame. Returns the number of ranked claims.
+    """
+    records = ClaimRecordStore()
+    ranking = PriorityRanking(key=records.priority_key)
+    for claim in read_sink(results_path):
+        if claim["validation_status"] == "Valid":
+            ranking.add(records.append(claim))
+    write_ranking(records, ranking, ranking_path, **kwargs)
+    return len(ranking)
@@ -0,0 +1,276 @@
+import os
+import sqlite3
+import time
+
+DEFAULT_RESULTS_DB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "insurance_claims", "results.sqlite")
+# Rows per page of the GUI's history views
+PAGE_SIZE = 500
+
+COLUMNS = ("ClaimID", "Name", "ClaimType", "ClaimAmount", "validation_status", "validation_reasons")
+SEARCH_COLUMNS = ("ClaimID", "Name", "ClaimType", "validation_status", "validation_reasons")
+
+# One row per claim, keyed by claim ID so saving a claim again replaces it. The partial
+# index holds the Priority Ranking order (amount, highest first, then claim ID), so a
+# ranking page is a range scan however many claims there are.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    ClaimID INTEGER PRIMARY KEY,
+    Name TEXT,
+    ClaimType TEXT,
+    ClaimAmount,
+    validation_status TEXT,
+    validation_reasons TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS claims_status ON claims (validation_status);
+CREATE INDEX IF NOT EXISTS claims_type ON claims (ClaimType);
+CREATE INDEX IF NOT EXISTS claims_amount ON claims (ClaimAmount);
+CREATE INDEX IF NOT EXISTS claims_priority ON claims (ClaimAmount DESC, ClaimID) WHERE validation_status = 'Valid';
+"""
+
+# Trigram full-text index over the searchable columns, kept in step by triggers. Trigrams
+# match any substring of three or more characters, like the GUI's ClaimSearchIndex.
+FTS_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS claims_fts USING fts5(
+    {', '.join(SEARCH_COLUMNS)}, content='claims', content_rowid='ClaimID', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS claims_fts_insert AFTER INSERT ON claims BEGIN
+    INSERT INTO claims_fts (rowid, {', '.join(SEARCH_COLUMNS)})
+    VALUES (new.ClaimID, {', '.join('new.' + column for column in SEARCH_COLUMNS)});
+END;
+CREATE TRIGGER IF NOT EXISTS claims_fts_delete AFTER DELETE ON claims BEGIN
+    INSERT INTO claims_fts (claims_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+    VALUES ('delete', old.ClaimID, {', '.join('old.' + column for column in SEARCH_COLUMNS)});
+END;
+CREATE TRIGGER IF NOT EXISTS claims_fts_update AFTER UPDATE ON claims BEGIN
+    INSERT INTO claims_fts (claims_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+    VALUES ('delete', old.ClaimID, {', '.join('old.' + column for column in SEARCH_COLUMNS)});
+    INSERT INTO claims_fts (rowid, {', '.join(SEARCH_COLUMNS)})
+    VALUES (new.ClaimID, {', '.join('new.' + column for column in SEARCH_COLUMNS)});
+END;
+"""
+
+# A Priority Ranking exported into the database, rebuilt on each export
+RANKING_SCHEMA = f"""
+DROP TABLE IF EXISTS priority_ranking;
+CREATE TABLE priority_ranking (
+    priority_score INTEGER PRIMARY KEY,
+    {', '.join(COLUMNS)}
+);
+"""
+
+UPSERT = (f"INSERT INTO claims ({', '.join(COLUMNS)}, updated) VALUES ({', '.join('?' * (len(COLUMNS) + 1))}) "
+          f"ON CONFLICT (ClaimID) DO UPDATE SET "
+          f"{', '.join(f'{column} = excluded.{column}' for column in COLUMNS[1:])}, updated = excluded.updated")
+
+# Queries shorter than a trigram can't use the full-text index
+GRAM = 3
+
+
+def _stored_amount(amount):
+    # OCR noise can exceed SQLite's 64-bit integers; such amounts are kept as reals so
+    # they still sort by size
+    if amount is None or -2 ** 63 <= amount < 2 ** 63:
+        return amount
+    return float(amount)
+
+
+def _claim(row):
+    claim = dict(zip(COLUMNS, row))
+    if isinstance(claim["ClaimAmount"], float):
+        claim["ClaimAmount"] = int(claim["ClaimAmount"])
+    return claim
+
+
+def _like_pattern(text):
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class ClaimResultsDB:
+    """Every processed claim, kept across sessions in an indexed SQLite file.
+
+    Saving a claim with an ID already stored replaces it, so reprocessing a
+    form (whose ID the job ledger keeps stable) doesn't duplicate it. Reads
+    are paged by key: search() and ranking() continue after the last row of
+    the previous page rather than skipping an offset, so any page of
+    millions of claims costs one index range scan. Writes are committed by
+    commit() or close().
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        # Same durability trade-off as the job ledger: a crash loses at most the last commits
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite older than 3.34 has no trigram tokenizer; searches scan instead
+            self.fts = False
+
+    def put(self, claim):
+        self.put_many([claim])
+
+    def put_many(self, claims):
+        # claims are dicts or ClaimRecords
+        now = time.time()
+        self.connection.executemany(UPSERT, [
+            (claim["ClaimID"], claim["Name"], claim["ClaimType"], _stored_amount(claim["ClaimAmount"]),
+             claim["validation_status"], claim["validation_reasons"], now) for claim in claims])
+
+    def replace_ranking(self, claims):
+        # claims in priority order; they replace the database's priority_ranking table
+        self.connection.executescript(RANKING_SCHEMA)
+        self.connection.executemany(
+            f"INSERT INTO priority_ranking VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+            [(score, claim["ClaimID"], claim["Name"], claim["ClaimType"], _stored_amount(claim["ClaimAmount"]),
+              claim["validation_status"], claim["validation_reasons"]) for score, claim in enumerate(claims, 1)])
+
+    def next_claim_id(self, default=101):
+        # The claim ID after the highest one stored
+        highest = self.connection.execute("SELECT MAX(ClaimID) FROM claims").fetchone()[0]
+        return default if highest is None else max(default, highest + 1)
+
+    def count(self, status=None):
+        if status is None:
+            return self.connection.execute("SELECT COUNT(*) FROM claims").fetchone()[0]
+        return self.connection.execute("SELECT COUNT(*) FROM claims WHERE validation_status = ?",
+                                       (status,)).fetchone()[0]
+
+    def search(self, text="", status=None, claim_type=None, min_amount=None, max_amount=None, after=None,
+               limit=PAGE_SIZE):
+        """Claims matching every given filter, in claim ID order.
+
+        text matches case-insensitively anywhere in the claim ID, name, claim
+        type, status or reasons, as in the GUI's session search. Returns up
+        to limit claims with IDs above after.
+        """
+        clauses, params = [], []
+        source, key = "claims", "claims.ClaimID"
+        text = text.lower()
+        if text and len(text) >= GRAM and self.fts:
+            # The full-text index drives the query (CROSS JOIN fixes the order) and yields
+            # matches in rowid order, so a page stops after limit matches
+            source, key = "claims_fts CROSS JOIN claims ON claims.ClaimID = claims_fts.rowid", "claims_fts.rowid"
+            clauses.append("claims_fts MATCH ?")
+            params.append('"' + text.replace('"', '""') + '"')
+        elif text:
+            clauses.append("(" + " OR ".join(f"lower({column}) LIKE ? ESCAPE '\\'" for column in SEARCH_COLUMNS)
+                           + ")")
+            params.extend([_like_pattern(text)] * len(SEARCH_COLUMNS))
+        for clause, value in (("claims.validation_status = ?", status), ("claims.ClaimType = ?", claim_type),
+                              ("claims.ClaimAmount >= ?", min_amount), ("claims.ClaimAmount <= ?", max_amount),
+                              (f"{key} > ?", after)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.connection.execute(
+            f"SELECT {', '.join('claims.' + column for column in COLUMNS)} FROM {source} {where} "
+            f"ORDER BY {key} LIMIT ?", (*params, limit))
+        return [_claim(row) for row in cursor]
+
+    def ranking(self, after=None, limit=PAGE_SIZE):
+        # Valid claims in priority order, continuing after the (ClaimAmount, ClaimID) of
+        # the last claim of the previous page
+        where = "validation_status = 'Valid'"
+        params = ()
+        if after is not None:
+            # Written so the amount bound is a plain range on the index
+            where += " AND ClaimAmount <= ? AND (ClaimAmount < ? OR ClaimID > ?)"
+            params = (after[0], after[0], after[1])
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM claims INDEXED BY claims_priority WHERE {where} "
+            f"ORDER BY ClaimAmount DESC, ClaimID LIMIT ?", (*params, limit))
+        return [_claim(row) for row in cursor]
+
+    def __iter__(self):
+        # Every claim in claim ID order, read a page at a time
+        after = None
+        while True:
+            claims = self.search(after=after, limit=PAGE_SIZE * 10)
+            yield from claims
+            if len(claims) < PAGE_SIZE * 10:
+                return
+            after = claims[-1]["ClaimID"]
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+
+class ResultPager:
+    """Moves back and forth through a query a page at a time.
+
+    fetch(after, limit) returns rows following the key after (None for the
+    first page) and key(row) gives a row's key. The key each page starts
+    after is kept, so going back re-runs that page's query instead of
+    counting through the rows before it.
+    """
+
+    def __init__(self, fetch, key, page_size=PAGE_SIZE):
+        self.fetch = fetch
+        self.key = key
+        self.page_size = page_size
+        self.starts = [None]
+        self.rows = []
+        self.has_next = False
+
+    @property
+    def offset(self):
+        # Position of the page's first row among all the rows
+        return (len(self.starts) - 1) * self.page_size
+
+    @property
+    def has_previous(self):
+        return len(self.starts) > 1
+
+    def load(self):
+        # One extra row tells whether there is a next page
+        rows = self.fetch(self.starts[-1], self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        self.rows = rows[:self.page_size]
+        return self.rows
+
+    def first(self):
+        self.starts = [None]
+        return self.load()
+
+    def next(self):
+        if self.has_next:
+            self.starts.append(self.key(self.rows[-1]))
+        return self.load()
+
+    def previous(self):
+        if self.has_previous:
+            self.starts.pop()
+        return self.load()
+
+
+_results_db = None
+_results_db_configured = False
+
+
+def configure_results_db(path=None, enabled=True):
+    global _results_db, _results_db_configured
+    if _results_db is not None:
+        _results_db.close()
+    _results_db_configured = True
+    _results_db = ClaimResultsDB(path or DEFAULT_RESULTS_DB_PATH) if enabled else None
+    return _results_db
+
+
+def get_results_db():
+    # The GUI's results database: CLAIMS_RESULTS_DB names the file, or disables it with 0
+    if not _results_db_configured:
+        path = os.environ.get("CLAIMS_RESULTS_DB")
+        configure_results_db(path if path != "0" else None, enabled=path != "0")
+    return _results_db
@@ -0,0 +1,92 @@
+SEARCH_FIELDS = ("ClaimID", "Name", "ClaimType", "validation_status", "validation_reasons")
+
+# Queries shorter than this scan the cached haystacks instead of the trigram postings
+GRAM = 3
+
+
+def search_text(record):
+    # Fields are joined with a separator that never appears in a query, so a
+    # match can't straddle two fields
+    return "\0".join(str(record[field] or "").lower() for field in SEARCH_FIELDS)
+
+
+class ClaimSearchIndex:
+    """Trigram index over the searchable claim fields, updated as records arrive.
+
+    A query is answered from the shortest posting list among its trigrams and
+    each candidate is confirmed with a substring check, so results match the
+    plain substring search exactly. Status filtering uses a per-status set.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.haystacks = {}
+        self.statuses = {}
+        self.by_status = {}
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.haystacks)
+
+    def add(self, record_id, record):
+        if record_id in self.haystacks:
+            self.remove(record_id)
+
+        haystack = search_text(record)
+        self.haystacks[record_id] = haystack
+        status = record["validation_status"]
+        self.statuses[record_id] = status
+        self.by_status.setdefault(status, {})[record_id] = None
+
+        postings = self.postings
+        for gram in {haystack[i:i + GRAM] for i in range(len(haystack) - GRAM + 1)}:
+            if "\0" in gram:
+                continue
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = {record_id: None}
+            else:
+                ids[record_id] = None
+
+    def remove(self, record_id):
+        haystack = self.haystacks.pop(record_id)
+        status = self.statuses.pop(record_id)
+        self.by_status[status].pop(record_id, None)
+        for gram in {haystack[i:i + GRAM] for i in range(len(haystack) - GRAM + 1)}:
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.pop(record_id, None)
+
+    def matches(self, record_id, text, status=None):
+        if status is not None and self.statuses.get(record_id) != status:
+            return False
+        return text.lower() in self.haystacks.get(record_id, "")
+
+    def search(self, text, status=None):
+        # Returns matching record ids in ascending order
+        text = text.lower()
+        if status is not None:
+            scope = self.by_status.get(status, {})
+        else:
+            scope = self.haystacks
+
+        if not text:
+            return sorted(scope)
+
+        if len(text) < GRAM:
+            candidates = scope
+        else:
+            grams = {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+            postings = [self.postings.get(gram) for gram in grams]
+            if any(ids is None for ids in postings):
+                return []
+            candidates = min(postings, key=len)
+            if len(scope) < len(candidates):
+                candidates = scope
+
+        haystacks = self.haystacks
+        statuses = self.statuses
+        return sorted(rid for rid in candidates
+                      if text in haystacks[rid] and (status is None or statuses[rid] == status))
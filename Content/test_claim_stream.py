@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from claim_stream import merge_top, stream_validate
+from claims_cli import main
+
+
+def test_merge_top_breaks_ties_on_claim_id():
+    top = merge_top(None, pd.DataFrame({"ClaimID": [3, 1, 2], "ClaimAmount": [5.0, 5.0, 9.0]}), 2)
+    assert list(top["ClaimID"]) == [2, 1]
+
+
+def test_merge_top_without_claim_id_keeps_file_order():
+    first = pd.DataFrame({"PatientID": ["a", "b"], "ClaimAmount": [5.0, 1.0]})
+    second = pd.DataFrame({"PatientID": ["c", "d"], "ClaimAmount": [5.0, 9.0]})
+    top = merge_top(merge_top(None, first, 3), second, 3)
+    assert list(top["PatientID"]) == ["d", "a", "c"]
+
+
+@pytest.mark.parametrize("rows", [2, 0])
+@pytest.mark.parametrize("duplicates", [[], ["--no-duplicates"]])
+def test_validate_csv_without_claim_id(tmp_path, rows, duplicates):
+    path = tmp_path / "claims.csv"
+    pd.DataFrame({"PatientID": ["a", "b"][:rows], "ClaimAmount": [5.0, 7.0][:rows]}).to_csv(path, index=False)
+    ranking = tmp_path / "ranking.csv"
+    assert main(["validate-csv", str(path), "--out", str(tmp_path / "out.csv"), "--ranking", str(ranking)]
+                + duplicates) == 0
+    if rows:
+        assert list(pd.read_csv(ranking)["PatientID"]) == ["b", "a"]
+
+
+def test_stream_validate_rejects_output_over_input(tmp_path):
+    path = tmp_path / "claims.csv"
+    pd.DataFrame({"ClaimID": [1], "ClaimAmount": [5.0]}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        stream_validate(str(path), str(path))
+    assert len(pd.read_csv(path)) == 1
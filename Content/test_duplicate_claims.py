@@ -0,0 +1,41 @@
+import pandas as pd
+
+from claim_stream import stream_validate
+from claims_cli import main
+from duplicate_claims import DuplicateClaimDetector
+
+
+def write_claims(path, rows):
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def test_table_without_block_columns_matches_nothing():
+    df = pd.DataFrame({"ClaimID": ["1", "2"], "ClaimAmount": [100.0, 100.0], "ClaimType": ["Routine"] * 2})
+    kinds, duplicate_of = DuplicateClaimDetector().check(df)
+    assert list(kinds) == [0, 0]
+    assert list(duplicate_of) == [None, None]
+
+
+def test_validate_csv_without_block_columns(tmp_path, capsys):
+    path = write_claims(tmp_path / "claims.csv", {"ClaimID": [1, 2], "ClaimAmount": [100.0, 100.0],
+                                                  "ClaimType": ["Routine", "Routine"]})
+    out = tmp_path / "out.csv"
+    assert main(["validate-csv", path, "--out", str(out)]) == 0
+    assert "Not checking for duplicate claims" in capsys.readouterr().err
+    result = pd.read_csv(out)
+    assert len(result) == 2
+    assert "DuplicateOf" not in result
+
+    summary = stream_validate(path, duplicates=DuplicateClaimDetector())
+    assert summary.total == 2
+
+
+def test_validate_csv_flags_duplicates(tmp_path):
+    row = {"ClaimID": 1, "PatientID": "P1", "ProviderID": "D1", "ProcedureCode": "ab123",
+           "ClaimDate": "2024-01-01", "ClaimAmount": 100.0, "ClaimType": "Routine"}
+    path = write_claims(tmp_path / "claims.csv", [row, dict(row, ClaimID=2)])
+    out = tmp_path / "out.csv"
+    assert main(["validate-csv", path, "--out", str(out)]) == 0
+    result = pd.read_csv(out)
+    assert list(result["DuplicateOf"].fillna(0).astype(int)) == [0, 1]
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+PREVIEW_SIZE = (300, 400)
+DEFAULT_MAX_ITEMS = 64
+DEFAULT_PREFETCH = 3
+
+
+def load_thumbnail(path, max_width=PREVIEW_SIZE[0], max_height=PREVIEW_SIZE[1]):
+    # RGB PIL image of the form for display, or None if it can't be decoded. Safe to call off
+    # the main thread; the Tk PhotoImage must still be made on it.
+    import cv2
+    from PIL import Image
+    from form_pages import read_page, split_page_ref
+    from image_preprocessing import load_preview
+
+    path, page = split_page_ref(path)
+    if page is None:
+        img = load_preview(path, max_width, max_height)
+    else:
+        img = read_page(path, page, color=True, max_size=(max_width, max_height))
+    if img is None:
+        return None
+    return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+
+
+class ThumbnailCache:
+    """Bounded LRU of form previews, decoded on a background thread.
+
+    load() returns a Future for a path's thumbnail: already resolved when the
+    thumbnail is cached, otherwise resolved by the loader thread. prefetch()
+    queues the forms around the one being shown so Previous/Next usually find
+    them ready. Entries are keyed by path, so clear() the cache when the files
+    behind it may have changed. A 300x400 RGB thumbnail is about 360 KB.
+    """
+
+    def __init__(self, loader=load_thumbnail, max_items=DEFAULT_MAX_ITEMS, max_workers=1):
+        self.loader = loader
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnails")
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path):
+        with self.lock:
+            if path in self.items:
+                self.items.move_to_end(path)
+                self.hits += 1
+                future = Future()
+                future.set_result(self.items[path])
+                return future
+            self.misses += 1
+            return self._submit(path)
+
+    def prefetch(self, paths, current=None):
+        # paths nearest first, as the loader works through them in order. Queued loads that
+        # are neither in paths nor current are dropped, so flipping quickly through a batch
+        # doesn't leave the loader busy with forms the reviewer has already passed.
+        with self.lock:
+            wanted = set(paths)
+            wanted.add(current)
+            for path, future in list(self.pending.items()):
+                if path not in wanted and future.cancel():
+                    del self.pending[path]
+            for path in paths:
+                if path not in self.items:
+                    self._submit(path)
+
+    def _submit(self, path):
+        # Caller holds the lock
+        future = self.pending.get(path)
+        if future is None:
+            future = self.pending[path] = self.executor.submit(self._load, path)
+        return future
+
+    def _load(self, path):
+        try:
+            image = self.loader(path)
+        except Exception:
+            image = None
+        with self.lock:
+            if self.pending.pop(path, None) is not None:
+                self.items[path] = image
+                self.items.move_to_end(path)
+                while len(self.items) > self.max_items:
+                    self.items.popitem(last=False)
+        return image
+
+    def clear(self):
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            # Loads already running finish but aren't stored
+            self.pending = {}
+            self.items.clear()
+
+    def shutdown(self):
+        self.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def neighbours(index, count, distance=DEFAULT_PREFETCH):
+    # Indexes around index, nearest first and forward before backward, within range(count)
+    order = []
+    for step in range(1, distance + 1):
+        order.extend(i for i in (index + step, index - step) if 0 <= i < count)
+    return order